@@ -24,14 +24,29 @@
 # Use the following command to run:
 #   $python Audio_Classifier.py
 
+# Start-up only imports tkinter and the light feature_extraction modules.
+# pandas, scikit-learn, librosa and pygame are imported the first time
+# they are needed (on the worker thread for training), so the window
+# appears right away.
+
+import logging
 import os
+import queue
+import threading
 import tkinter as tk
-from tkinter import filedialog, Listbox, messagebox
-import pygame
-import pandas as pd
-from feature_extraction.Feature_Extractor import generate_csv
-from classifier.classifier import train_model 
-import joblib
+from tkinter import filedialog, Listbox, messagebox, ttk
+from feature_extraction.Feature_Extractor import generate_csv, ExtractionCancelled
+from feature_extraction.Audio_Catalog import AudioCatalog
+from feature_extraction.Feature_Cache import FeatureCache
+from feature_extraction.Audio_Fingerprint import FingerprintIndex
+from feature_extraction.Feature_Store import FeatureStore
+from feature_extraction.Extraction_Metrics import Metrics, configure_logging
+
+# Update an SGD model with only the new files instead of refitting the SVC
+INCREMENTAL_TRAINING = False
+
+# How often (ms) the Tk loop drains messages from the background worker
+POLL_INTERVAL_MS = 100
 
 class AudioClassifierGUI:
     def __init__(self, root):
@@ -52,9 +67,6 @@ class AudioClassifierGUI:
         # Set the dimensions of the screen place it in middle
         root.geometry('%dx%d+%d+%d' % (window_width, window_height, x, y))
 
-        # Initialize pygame for audio playback
-        pygame.mixer.init()
-
         # Create frames
         top_frame = tk.Frame(root)
         bottom_frame = tk.Frame(root)
@@ -72,6 +84,16 @@ class AudioClassifierGUI:
         top_button_frame.pack(side=tk.LEFT, fill=tk.Y, padx=10)
         self.load_button = tk.Button(top_button_frame, text="Load Folder of .wav files", command=self.load_folder)
         self.load_button.pack()
+        self.cancel_button = tk.Button(top_button_frame, text="Cancel", command=self.cancel_loading, state=tk.DISABLED)
+        self.cancel_button.pack(pady=5)
+
+        # Progress of the background extraction and training
+        progress_frame = tk.Frame(root)
+        progress_frame.grid(row=2, column=0, padx=10, pady=5, sticky="ew")
+        self.progress_bar = ttk.Progressbar(progress_frame, orient=tk.HORIZONTAL, length=400, mode='determinate')
+        self.progress_bar.pack(side=tk.LEFT, padx=10)
+        self.status_label = tk.Label(progress_frame, text="")
+        self.status_label.pack(side=tk.LEFT)
 
         # Bottom Frame Components
         self.test_label = tk.Label(bottom_frame, text="Testing Files")
@@ -90,27 +112,130 @@ class AudioClassifierGUI:
         self.file_paths = {}
         self.train_files = []
         self.test_files = []
+        self.feature_cache = FeatureCache()
+        self.catalog = AudioCatalog()
+        # Near-duplicate copies are extracted once and kept on one side of the split
+        self.fingerprints = FingerprintIndex()
+        self.feature_store = None
+        self.test_labels = {}
+
+        # Background worker state; Tk widgets are only touched from the main thread
+        self.worker = None
+        self.worker_queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.mixer = None  # pygame.mixer, initialised on first playback
 
     def load_folder(self):
-        
+        if self.worker is not None and self.worker.is_alive():
+            return
         folder_path = filedialog.askdirectory()
-        messagebox.showinfo("Please Wait", "Loading files. Please wait a few seconds...")
         if folder_path:
-            # Populate file_paths dictionary
-            for root, dirs, files in os.walk(folder_path):
-                for file in files:
-                    full_path = os.path.join(root, file)
-                    self.file_paths[file] = full_path
-            self.extract_features_and_train(folder_path)
-        #self.root.after(2000, lambda: messagebox.showinfo("Loading Complete", "Files loaded successfully!"))
+            self.start_loading(folder_path)
 
-    def extract_features_and_train(self, folder_path):
-        generate_csv(folder_path)
-        x_train, x_test, y_train, y_test, self.model, self.train_files, self.test_files, self.test_labels = train_model()
-        # Save the model for later use
-        joblib.dump(self.model, 'audio_classifier_model.pkl')
+    def start_loading(self, folder_path):
+        self.train_listbox.delete(0, tk.END)
+        self.test_listbox.delete(0, tk.END)
+        self.progress_bar['value'] = 0
+        self.status_label.config(text="Scanning folder...")
+        self.load_button.config(state=tk.DISABLED)
+        self.test_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+
+        self.cancel_event.clear()
+        self.worker = threading.Thread(target=self.extract_features_and_train, args=(folder_path,), daemon=True)
+        self.worker.start()
+        self.root.after(POLL_INTERVAL_MS, self.poll_worker)
+
+    def cancel_loading(self):
+        self.cancel_event.set()
+        self.cancel_button.config(state=tk.DISABLED)
+        self.status_label.config(text="Cancelling...")
 
-        self.update_file_lists()
+    def extract_features_and_train(self, folder_path):
+        # Runs on the worker thread; results go back to Tk through worker_queue
+        post = self.worker_queue.put
+        try:
+            # One walk, headers only; reused by extraction and playback
+            files = self.catalog.scan(folder_path)
+            post(("files", files))
+
+            metrics = Metrics()
+            generate_csv(folder_path, workers=None, cache=self.feature_cache, metrics=metrics, fingerprints=self.fingerprints,
+                         progress=lambda done, total, path, ok: post(("progress", done, total, os.path.basename(path), ok)),
+                         fingerprint_progress=lambda done, total, path, ok: post(("fingerprint_progress", done, total)),
+                         cancel=self.cancel_event, files=[info.path for info in files])
+            logging.info("Feature cache: %s", self.feature_cache.stats())
+            logging.info("Extraction stages: %s", metrics.snapshot()["stages"])
+            if self.cancel_event.is_set():
+                raise ExtractionCancelled()
+
+            post(("status", "Training model..."))
+            import joblib
+            from classifier.classifier import train_model
+            x_train, x_test, y_train, y_test, model, train_files, test_files, test_labels = train_model(incremental=INCREMENTAL_TRAINING)
+            # Save the model for later use
+            joblib.dump(model, 'audio_classifier_model.pkl')
+            post(("done", model, train_files, test_files, test_labels))
+        except ExtractionCancelled:
+            post(("cancelled",))
+        except Exception as e:
+            logging.exception("Loading failed")
+            post(("error", f"{type(e).__name__}: {e}"))
+
+    def poll_worker(self):
+        # Drain everything queued since the last poll and apply it in one go
+        finished = False
+        extracted = []
+        while True:
+            try:
+                message = self.worker_queue.get_nowait()
+            except queue.Empty:
+                break
+            kind = message[0]
+            if kind == "files":
+                # Populate file_paths dictionary
+                for info in message[1]:
+                    self.file_paths[info.name] = info.path
+                self.status_label.config(text=f"Extracting features from {len(message[1])} files...")
+            elif kind == "fingerprint_progress":
+                _, done, total = message
+                self.progress_bar['maximum'] = total
+                self.progress_bar['value'] = done
+                self.status_label.config(text=f"Looking for duplicates: {done} of {total} files")
+            elif kind == "progress":
+                _, done, total, file_name, ok = message
+                self.progress_bar['maximum'] = total
+                self.progress_bar['value'] = done
+                self.status_label.config(text=f"Extracted {done} of {total} files")
+                if ok:
+                    extracted.append(file_name)
+            elif kind == "status":
+                self.status_label.config(text=message[1])
+            elif kind == "done":
+                _, self.model, self.train_files, self.test_files, self.test_labels = message
+                self.feature_store = FeatureStore()
+                self.update_file_lists()
+                self.status_label.config(text=f"Loaded {len(self.train_files) + len(self.test_files)} files")
+                finished = True
+            elif kind == "cancelled":
+                self.status_label.config(text="Cancelled")
+                finished = True
+            elif kind == "error":
+                self.status_label.config(text="Failed")
+                messagebox.showerror("Error", message[1])
+                finished = True
+
+        # Until the split is known, extracted files are listed in the top box as they arrive
+        if extracted:
+            self.train_listbox.insert(tk.END, *extracted)
+            self.train_listbox.see(tk.END)
+
+        if finished:
+            self.load_button.config(state=tk.NORMAL)
+            self.test_button.config(state=tk.NORMAL)
+            self.cancel_button.config(state=tk.DISABLED)
+        else:
+            self.root.after(POLL_INTERVAL_MS, self.poll_worker)
 
     def update_file_lists(self):
           # Clear existing lists
@@ -118,38 +243,46 @@ class AudioClassifierGUI:
         self.test_listbox.delete(0, tk.END)
 
         # Populate training files list (non-clickable)
-        for file in self.train_files:
-            self.train_listbox.insert(tk.END, file)
+        if self.train_files:
+            self.train_listbox.insert(tk.END, *self.train_files)
 
         # Populate testing files list (clickable)
-        for file in self.test_files:
-            self.test_listbox.insert(tk.END, file)
+        if self.test_files:
+            self.test_listbox.insert(tk.END, *self.test_files)
 
 
 
     def test_file(self):
         selected_file = self.test_listbox.get(tk.ACTIVE)
         if selected_file:
-            # Load the model for testing
-            self.model = joblib.load('audio_classifier_model.pkl')
-            scaler = joblib.load('scaler.pkl')
+            from classifier.svm_artifact import ARTIFACT_PATH, CompiledSVM, is_current
+
+            # Load the model for testing. train_model writes the float32 artifact right
+            # after scaler.pkl; it skips unpickling sklearn and folds the scaling in.
+            scaler = None
+            if is_current(ARTIFACT_PATH, 'scaler.pkl'):
+                self.model = CompiledSVM.load(ARTIFACT_PATH)
+            else:
+                import joblib
+                self.model = joblib.load('audio_classifier_model.pkl')
+                scaler = joblib.load('scaler.pkl')
             
             if selected_file in self.test_labels:
                 # Get the ground truth label from the dictionary
                 ground_truth = "Music" if self.test_labels[selected_file] == "yes" else "Speech"
 
-                # Load the features from the CSV file
-                features_data = pd.read_csv('feature_extraction/features.csv')
-
-                # Find the row corresponding to the selected file
-                selected_row = features_data[features_data['fileName'] == selected_file]
-                print("Selected Row:")
-                print(selected_row)
+                # Look up the selected file in the feature store
+                selected_features = self.feature_store.lookup(selected_file)
+                logging.debug("Selected Features: %s", selected_features)
 
-                if not selected_row.empty:
-                    # Extract the features for the selected file
-                    features = selected_row.drop(["Label", "fileName"], axis=1)
-                    normalized_features = scaler.transform(features)
+                if selected_features is not None:
+                    if scaler is None:
+                        normalized_features = [selected_features]
+                    else:
+                        # Extract the features for the selected file
+                        import pandas as pd
+                        features = pd.DataFrame([selected_features], columns=self.feature_store.columns)
+                        normalized_features = scaler.transform(features)
 
                     # Debugging message to check the loaded features
                     #print("Loaded Features:")
@@ -184,16 +317,27 @@ class AudioClassifierGUI:
         selected_file = self.test_listbox.get(tk.ACTIVE) 
         if selected_file and selected_file in self.file_paths:
             file_path = self.file_paths[selected_file]
+            if self.mixer is None:
+                import pygame
+                pygame.mixer.init()
+                self.mixer = pygame.mixer
             # Play the audio file using pygame
-            pygame.mixer.music.load(file_path)
-            pygame.mixer.music.play()
+            self.mixer.music.load(file_path)
+            self.mixer.music.play()
     
     def print_summary(self):
         print("File, Model Output, Ground Truth Label")
         for file_name, model_output, ground_truth in self.results:
             print(f"{file_name}, Model output: {model_output}, Ground truth label: {ground_truth}")
 
-root = tk.Tk()
-gui = AudioClassifierGUI(root)
-root.mainloop()
-gui.print_summary()
+def main():
+    configure_logging()
+    root = tk.Tk()
+    gui = AudioClassifierGUI(root)
+    root.mainloop()
+    gui.print_summary()
+
+# Extraction workers re-import this module under the spawn start method
+# (Windows, macOS); the guard keeps them from opening another window
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Import-time benchmark: cold start cost of each entry point
+# Each module is imported in a fresh interpreter with -X importtime; the
+# cumulative time of the module's own line is its full import cost.
+# Exits with status 1 when an entry point goes over its budget, so it can
+# run as a check in CI.
+# Run from the repository root:
+#   $python -m benchmarks.bench_import_time [--repeat 5] [--top 8]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry point -> budget in seconds (best of --repeat runs). Measured at
+# roughly 0.1 s for the extractor and the GUI and 0.5 s for the CLIs
+# (pandas). The heavy libraries (scipy.signal, sklearn) each cost about a
+# second, so going over budget usually means one is imported eagerly again.
+IMPORT_BUDGETS = {
+    "feature_extraction.Feature_Extractor": 0.4,
+    "feature_extraction.Audio_Buffer": 0.3,
+    "classifier.batch_predict": 1.0,
+    "classifier.inference_service": 1.0,
+    "classifier.live_classifier": 1.0,
+    "classifier.segment_timeline": 1.0,
+    "Audio_Classifier": 0.5,
+    "initial_gui": 0.5,
+}
+
+def import_profile(module):
+    # Returns (cumulative seconds for module, [(self seconds, name), ...])
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=REPO_ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise ImportError(result.stderr.strip().splitlines()[-1])
+    total = None
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append((int(self_us) / 1e6, name.strip()))
+        if name.strip() == module:
+            total = int(cumulative_us) / 1e6
+    return total, sorted(entries, reverse=True)
+
+def measure(modules=IMPORT_BUDGETS, repeat=5):
+    results = {}
+    for module in modules:
+        try:
+            runs = [import_profile(module) for _ in range(repeat)]
+        except ImportError as e:
+            # e.g. pygame missing on a headless worker; reported, not failed
+            results[module] = {"seconds": None, "heaviest": [], "error": str(e)}
+            continue
+        total, heaviest = min(runs, key=lambda run: run[0])
+        results[module] = {"seconds": total, "heaviest": heaviest}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the import time of each entry point")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="heaviest imports to list per entry point")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = measure(repeat=args.repeat)
+    over = []
+    for module, result in results.items():
+        budget = IMPORT_BUDGETS[module]
+        if result["seconds"] is None:
+            if not args.json:
+                print(f"{module:<40} skipped: {result['error']}")
+            continue
+        if result["seconds"] > budget:
+            over.append(module)
+        if not args.json:
+            flag = "  OVER BUDGET" if module in over else ""
+            print(f"{module:<40} {result['seconds']*1000:8.1f} ms  (budget {budget*1000:.0f} ms){flag}")
+            for seconds, name in result["heaviest"][:args.top]:
+                print(f"    {seconds*1000:8.1f} ms  {name}")
+    if args.json:
+        print(json.dumps({module: {"seconds": result["seconds"], "budget": IMPORT_BUDGETS[module], "error": result.get("error")}
+                          for module, result in results.items()}, indent=2))
+    return 1 if over else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+# Micro-benchmark: vectorized time domain features vs the original extractors
+# Run from the repository root:
+#   $python -m benchmarks.bench_time_domain [seconds]
+
+import sys
+import time
+
+import librosa
+import numpy as np
+
+from feature_extraction.Audio_Buffer import TARGET_SR
+from feature_extraction.Feature_Time_Domain import time_domain_features
+
+# The original implementations, kept here as the baseline
+def legacy_avg_energy(samples):
+    samples = samples.copy()
+    for sample in range(len(samples)):
+        samples[sample] = samples[sample]*samples[sample]
+    return sum(samples)/len(samples)
+
+def legacy_zero_crossing(samples):
+    zero_crossings = librosa.zero_crossings(samples, pad=False)
+    return sum(zero_crossings) / (2*(len(zero_crossings)-1))
+
+def best_of(function, samples, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(samples)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 60.0
+    rng = np.random.default_rng(0)
+    samples = (0.1 * rng.standard_normal(int(seconds * TARGET_SR))).astype(np.float32)
+    print(f"Signal: {seconds:.0f} s at {TARGET_SR} Hz, float32")
+
+    legacy_energy_time, legacy_energy = best_of(legacy_avg_energy, samples, 1)
+    legacy_zcr_time, legacy_zcr = best_of(legacy_zero_crossing, samples, 1)
+    new_time, features = best_of(time_domain_features, samples, 5)
+
+    print(f"legacy extract_avg_energy:   {legacy_energy_time*1000:10.2f} ms")
+    print(f"legacy extract_zero_crossing:{legacy_zcr_time*1000:10.2f} ms")
+    print(f"time_domain_features (all):  {new_time*1000:10.2f} ms")
+    print(f"speedup: {(legacy_energy_time + legacy_zcr_time) / new_time:.0f}x")
+    print(f"avg_energy   legacy={legacy_energy:.9g} new={features['avg_energy']:.9g}")
+    print(f"zero_crossing legacy={legacy_zcr:.9g} new={features['zero_crossing']:.9g}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# Training time against sample count: full SVC refit vs incremental update
+# Run from the repository root:
+#   $python -m benchmarks.bench_training [sizes...]
+
+# Rows are bootstrapped from features.csv with a little noise. For each
+# size N the full mode fits MinMaxScaler + svm.SVC on all N rows. The
+# incremental mode updates a model already trained on N rows with the
+# N/100 rows that arrive next, which is what a daily folder load costs.
+
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn import svm
+from sklearn.preprocessing import MinMaxScaler
+
+from classifier.incremental import IncrementalState
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or [1000, 5000, 20000, 50000]
+    data = pd.read_csv('feature_extraction/features.csv')
+    labels = (data["Label"] == "yes").astype(int).to_numpy()
+    base = data.drop(["fileName", "Label"], axis=1).to_numpy()
+    rng = np.random.default_rng(0)
+
+    results = []
+    for n in sizes:
+        picks = rng.integers(0, len(base), n)
+        x = base[picks] * (1.0 + 0.2 * rng.standard_normal((n, base.shape[1])))
+        y = labels[picks]
+        new = max(1, n // 100)
+
+        start = time.perf_counter()
+        scaler = MinMaxScaler()
+        svm.SVC().fit(scaler.fit_transform(x), y)
+        full = time.perf_counter() - start
+
+        state = IncrementalState(x.shape[1])
+        state.partial_fit(x[:-new], y[:-new])
+        start = time.perf_counter()
+        state.partial_fit(x[-new:], y[-new:])
+        incremental = time.perf_counter() - start
+
+        result = {"rows": n, "new_rows": new, "svc_refit_s": full, "incremental_update_s": incremental}
+        results.append(result)
+        print(f"{n:>8} rows: SVC refit {full:8.3f} s | incremental +{new} rows {incremental:8.4f} s")
+
+    print(json.dumps(results))
+
+if __name__ == "__main__":
+    main()
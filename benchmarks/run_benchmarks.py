@@ -0,0 +1,271 @@
+# Benchmark Suite
+# Times the extraction, training and inference hot paths and writes JSON
+
+# Each benchmark runs in a fresh spawned process, so its peak RSS is its
+# own and not that of whatever ran before it. Inputs are the bundled
+# audio/music and audio/speech WAVs plus synthetic short (1 s) and long
+# (5 min) signals written to a temporary directory. Training runs inside a
+# scratch copy of the feature table, so the repo's .pkl files are never
+# overwritten.
+#
+# Run from the repository root:
+#   $python -m benchmarks.run_benchmarks --output bench.json
+#   $python -m benchmarks.run_benchmarks --only extract_ pipeline_short
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AUDIO_DIR = os.path.join(REPO_ROOT, 'audio')
+FEATURES_CSV = os.path.join(REPO_ROOT, 'feature_extraction', 'features.csv')
+MODEL_PATH = os.path.join(REPO_ROOT, 'audio_classifier_model.pkl')
+SCALER_PATH = os.path.join(REPO_ROOT, 'scaler.pkl')
+
+SHORT_SECONDS = 1.0
+LONG_SECONDS = 300.0
+BATCH_ROWS = 1000
+
+def bundled_files():
+    from feature_extraction.Feature_Extractor import generate_file_list
+    return sorted(generate_file_list(AUDIO_DIR))
+
+def synthetic_file(directory, seconds, sr=16000):
+    # Tone bursts over noise, written as 16-bit PCM like the bundled clips
+    import soundfile as sf
+    path = os.path.join(directory, f'synthetic_{int(seconds)}s.wav')
+    if not os.path.exists(path):
+        rng = np.random.default_rng(0)
+        t = np.arange(int(seconds * sr)) / sr
+        y = 0.3 * np.sin(2 * np.pi * 440 * t) * (np.sin(2 * np.pi * 0.5 * t) > 0) + 0.02 * rng.standard_normal(len(t))
+        sf.write(path, y.astype(np.float32), sr, subtype='PCM_16')
+    return path
+
+def _time_each(function, items):
+    start = time.perf_counter()
+    for item in items:
+        function(item)
+    return time.perf_counter() - start, len(items)
+
+# Each benchmark returns (wall seconds, number of files or calls)
+
+def bench_extractor(name, scratch):
+    from feature_extraction import Feature_Extraction_Avg_Energy, Feature_Extraction_Spectral_Centroid
+    from feature_extraction import Feature_Extraction_Zero_Crossing_Rate, Feature_MFCCS
+    extractors = {
+        "avg_energy": Feature_Extraction_Avg_Energy.extract_avg_energy,
+        "spectral_centroid": Feature_Extraction_Spectral_Centroid.extract_spectral_centroid,
+        "zero_crossing": Feature_Extraction_Zero_Crossing_Rate.extract_zero_crossing,
+        "mfcc": Feature_MFCCS.extract_mfcc,
+    }
+    files = bundled_files()
+    extractors[name](files[0])  # Warm up librosa/numba outside the timing
+    return _time_each(extractors[name], files)
+
+def bench_load_audio(files):
+    # Decode (memory-mapped for PCM WAVs) and resample only
+    from feature_extraction.Audio_Buffer import load_audio
+    load_audio(files[0]).samples
+    return _time_each(lambda path: load_audio(path).samples, files)
+
+def bench_pipeline(files):
+    from feature_extraction.Feature_Extractor import pipeline
+    pipeline(files[0], [])
+    return _time_each(lambda path: pipeline(path, []), files)
+
+def bench_generate_csv(scratch, workers):
+    from feature_extraction.Feature_Extractor import generate_csv
+    start = time.perf_counter()
+    frame = generate_csv(AUDIO_DIR, workers=workers, output_path=os.path.join(scratch, 'features.csv'),
+                         store_path=os.path.join(scratch, 'feature_store'))
+    return time.perf_counter() - start, len(frame)
+
+def bench_train_model(scratch):
+    # train_model reads and writes relative paths, so run it in a scratch tree
+    os.makedirs(os.path.join(scratch, 'feature_extraction'), exist_ok=True)
+    shutil.copy(FEATURES_CSV, os.path.join(scratch, 'feature_extraction', 'features.csv'))
+    os.chdir(scratch)
+    from classifier.classifier import train_model
+    start = time.perf_counter()
+    result = train_model()
+    return time.perf_counter() - start, len(result[5]) + len(result[6])
+
+def _feature_rows(n):
+    import pandas as pd
+    data = pd.read_csv(FEATURES_CSV).drop(["fileName", "Label"], axis=1).to_numpy()
+    return np.resize(data, (n, data.shape[1]))
+
+def bench_predict_single(scratch):
+    from classifier.inference_service import Predictor
+    predictor = Predictor(MODEL_PATH, SCALER_PATH)
+    rows = _feature_rows(200)
+    return _time_each(lambda row: predictor.predict([row]), rows)
+
+def bench_predict_batched(scratch):
+    from classifier.inference_service import Predictor
+    predictor = Predictor(MODEL_PATH, SCALER_PATH)
+    rows = _feature_rows(BATCH_ROWS)
+    start = time.perf_counter()
+    predictor.predict(rows)
+    return time.perf_counter() - start, len(rows)
+
+def bench_model_load(scratch):
+    from classifier.inference_service import Predictor
+    start = time.perf_counter()
+    Predictor(MODEL_PATH, SCALER_PATH)
+    return time.perf_counter() - start, 1
+
+def _artifact(scratch):
+    # Compile the bundled model once per run, the way train_model exports it
+    import joblib
+    from classifier.svm_artifact import compile_model
+    path = os.path.join(scratch, 'audio_classifier_model.npz')
+    if not os.path.exists(path):
+        compile_model(joblib.load(MODEL_PATH), joblib.load(SCALER_PATH)).save(path)
+    return path
+
+def bench_predict_compiled_single(scratch):
+    from classifier.inference_service import Predictor
+    predictor = Predictor(artifact_path=_artifact(scratch))
+    rows = _feature_rows(200)
+    return _time_each(lambda row: predictor.predict([row]), rows)
+
+def bench_predict_compiled_batched(scratch):
+    from classifier.inference_service import Predictor
+    predictor = Predictor(artifact_path=_artifact(scratch))
+    rows = _feature_rows(BATCH_ROWS)
+    start = time.perf_counter()
+    predictor.predict(rows)
+    return time.perf_counter() - start, len(rows)
+
+def bench_model_load_compiled(scratch):
+    # Compare with model_load, which unpickles the SVC and the scaler
+    from classifier.svm_artifact import CompiledSVM
+    path = _artifact(scratch)
+    start = time.perf_counter()
+    CompiledSVM.load(path)
+    return time.perf_counter() - start, 1
+
+def bench_import_time(scratch):
+    # Cold imports of every entry point, each in its own interpreter
+    from benchmarks.bench_import_time import measure
+    results = measure(repeat=3)
+    return sum(result["seconds"] or 0.0 for result in results.values()), len(results)
+
+BENCHMARKS = {
+    "extract_avg_energy": lambda scratch: bench_extractor("avg_energy", scratch),
+    "extract_spectral_centroid": lambda scratch: bench_extractor("spectral_centroid", scratch),
+    "extract_zero_crossing": lambda scratch: bench_extractor("zero_crossing", scratch),
+    "extract_mfcc": lambda scratch: bench_extractor("mfcc", scratch),
+    "load_audio_bundled": lambda scratch: bench_load_audio(bundled_files()),
+    "pipeline_bundled": lambda scratch: bench_pipeline(bundled_files()),
+    "pipeline_short": lambda scratch: bench_pipeline([synthetic_file(scratch, SHORT_SECONDS)] * 20),
+    "pipeline_long": lambda scratch: bench_pipeline([synthetic_file(scratch, LONG_SECONDS)]),
+    "generate_csv_serial": lambda scratch: bench_generate_csv(scratch, 1),
+    "generate_csv_parallel": lambda scratch: bench_generate_csv(scratch, None),
+    "train_model": bench_train_model,
+    "model_load": bench_model_load,
+    "import_time": bench_import_time,
+    "predict_single": bench_predict_single,
+    "predict_batched": bench_predict_batched,
+    "predict_compiled_single": bench_predict_compiled_single,
+    "predict_compiled_batched": bench_predict_compiled_batched,
+    "model_load_compiled": bench_model_load_compiled,
+}
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _run_in_child(name, scratch, results):
+    sys.stdout = sys.stderr  # Keep progress messages out of the JSON report
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(REPO_ROOT)
+    try:
+        wall, count = BENCHMARKS[name](scratch)
+        results.put({"wall_s": wall, "count": count, "peak_rss_mb": _peak_rss_mb()})
+    except Exception as e:
+        results.put({"error": f"{type(e).__name__}: {e}"})
+
+def run_benchmark(name, scratch):
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=_run_in_child, args=(name, scratch, results))
+    process.start()
+    while True:
+        try:
+            result = results.get(timeout=1.0)
+            break
+        except queue.Empty:
+            if not process.is_alive():
+                result = {"error": f"benchmark process exited with code {process.exitcode}"}
+                break
+    process.join()
+
+    result["name"] = name
+    if "wall_s" in result:
+        result["per_item_ms"] = result["wall_s"] / result["count"] * 1000.0 if result["count"] else None
+        result["items_per_s"] = result["count"] / result["wall_s"] if result["wall_s"] else None
+    return result
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    versions = {}
+    for module in ("numpy", "scipy", "librosa", "sklearn", "pandas"):
+        try:
+            versions[module] = __import__(module).__version__
+        except ImportError:
+            versions[module] = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "versions": versions,
+        "timestamp": time.time(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extraction, training and inference")
+    parser.add_argument("--only", nargs="*", help="run benchmarks whose names start with these prefixes")
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    names = [name for name in BENCHMARKS if not args.only or any(name.startswith(prefix) for prefix in args.only)]
+    scratch = tempfile.mkdtemp(prefix='audio_bench_')
+    results = []
+    try:
+        for name in names:
+            result = run_benchmark(name, scratch)
+            results.append(result)
+            if "error" in result:
+                print(f"{name:<28} ERROR {result['error']}", file=sys.stderr)
+            else:
+                print(f"{name:<28} {result['wall_s']:9.3f} s  {result['items_per_s']:10.1f}/s  {result['peak_rss_mb']:8.1f} MB", file=sys.stderr)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    report = json.dumps({"environment": environment(), "results": results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    else:
+        print(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# Batch Prediction
+# Classifies whole directories or file lists without the Tk GUI
+
+# Features are extracted in parallel with generate_rows. Then every file is
+# classified with one scaler.transform and one model.predict. Nothing here
+# imports tkinter or pygame, so it runs on headless servers.
+#
+# Use the following command to run:
+#   $python -m classifier.batch_predict audio/ --workers 8 --format jsonl --output predictions.jsonl
+#   $python -m classifier.batch_predict --file-list files.txt
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+import soundfile as sf
+
+from feature_extraction.Audio_Catalog import AudioCatalog
+from feature_extraction.Extraction_Metrics import Metrics, configure_logging
+from feature_extraction.Feature_Cache import FeatureCache
+from feature_extraction.Feature_Extractor import generate_file_list, generate_rows
+from .inference_service import MODEL_PATH, SCALER_PATH, Predictor, prediction_label
+
+def collect_files(inputs, file_list=None, catalog=None):
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            files.extend(generate_file_list(item, catalog))
+        else:
+            files.append(item)
+    if file_list:
+        with open(file_list) as f:
+            files.extend(line.strip() for line in f if line.strip())
+    return files
+
+def audio_seconds(path, catalog=None):
+    # Reads only the header: the catalog's for WAVs, soundfile's for anything else
+    try:
+        if catalog is not None:
+            duration = catalog.info(path).duration
+            if duration is not None:
+                return duration
+        return sf.info(path).duration
+    except Exception:
+        return 0.0
+
+def predict_files(files, predictor, workers=None, cache=None, streaming=False, metrics=None, catalog=None):
+    # Returns (results, failures, stats)
+    start = time.perf_counter()
+    rows, failures = generate_rows(files, workers=workers, cache=cache, streaming=streaming, metrics=metrics)
+    extracted = time.perf_counter()
+
+    failed = {path for path, _ in failures}
+    paths = [path for path in files if path not in failed]
+    predictions = predictor.predict([row[1:-1] for row in rows]) if rows else []
+    finished = time.perf_counter()
+
+    results = [
+        {"file": path, "prediction": int(prediction), "label": prediction_label(prediction)}
+        for path, prediction in zip(paths, predictions)
+    ]
+
+    total = finished - start
+    seconds_of_audio = sum(audio_seconds(path, catalog) for path in paths)
+    if catalog is not None:
+        catalog.save()
+    stats = {
+        "files": len(files),
+        "classified": len(results),
+        "failed": len(failures),
+        "extract_s": extracted - start,
+        "predict_s": finished - extracted,
+        "total_s": total,
+        "files_per_s": len(results) / total if total else 0.0,
+        "audio_s": seconds_of_audio,
+        "audio_s_per_s": seconds_of_audio / total if total else 0.0,
+    }
+    return results, failures, stats
+
+def write_results(results, output, output_format):
+    if output_format == "jsonl":
+        for result in results:
+            output.write(json.dumps(result) + "\n")
+    else:
+        writer = csv.DictWriter(output, fieldnames=["file", "prediction", "label"])
+        writer.writeheader()
+        writer.writerows(results)
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify .wav files as music or speech")
+    parser.add_argument("inputs", nargs="*", help="directories and/or .wav files")
+    parser.add_argument("--file-list", help="text file with one path per line")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--scaler", default=SCALER_PATH)
+    parser.add_argument("--artifact", help="predict with this svm_artifact .npz instead of --model/--scaler")
+    parser.add_argument("--workers", type=int, default=None, help="extraction processes (default: all CPUs)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--output", help="write predictions here instead of stdout")
+    parser.add_argument("--cache", action="store_true", help="reuse features from the on-disk feature cache")
+    parser.add_argument("--streaming", action="store_true", help="bounded-memory extraction for long recordings")
+    parser.add_argument("--metrics", help="write per-stage extraction metrics here (.prom for Prometheus text, else JSON)")
+    parser.add_argument("--profile-dir", help="write a cProfile dump per file into this directory")
+    parser.add_argument("--log-level", default="INFO")
+    parser.add_argument("--log-json", action="store_true", help="log one JSON object per line")
+    args = parser.parse_args()
+
+    # Logs go to stderr; stdout is kept for the predictions
+    configure_logging(level=args.log_level.upper(), json_format=args.log_json)
+
+    catalog = AudioCatalog()
+    files = collect_files(args.inputs, args.file_list, catalog)
+    if not files:
+        parser.error("no input files")
+
+    predictor = Predictor(args.model, args.scaler, args.artifact)
+    cache = FeatureCache() if args.cache else None
+    metrics = Metrics(profile_dir=args.profile_dir)
+    results, failures, stats = predict_files(files, predictor, workers=args.workers, cache=cache, streaming=args.streaming, metrics=metrics, catalog=catalog)
+
+    if args.output:
+        with open(args.output, 'w', newline='') as output:
+            write_results(results, output, args.format)
+    else:
+        write_results(results, sys.stdout, args.format)
+
+    if args.metrics:
+        with open(args.metrics, 'w') as f:
+            f.write(metrics.to_prometheus() if args.metrics.endswith('.prom') else metrics.to_json())
+
+    print(json.dumps(stats), file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,4 @@
+import logging
 import pandas as pd
 import numpy as np
 import random
@@ -7,18 +8,36 @@ import joblib
 from sklearn import svm
 from sklearn.metrics import precision_score
 from sklearn.metrics import recall_score
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import GroupShuffleSplit, train_test_split
 from sklearn.preprocessing import MinMaxScaler
 
+from feature_extraction.Audio_Fingerprint import duplicate_groups
+from feature_extraction.Feature_Store import FeatureStore, DEFAULT_STORE_PATH
+from .incremental import train_model_incremental
+from .svm_artifact import export_artifact
+
+FEATURES_CSV = 'feature_extraction/features.csv'
+
 GROUND_TRUTH_LABELS = {}
 
+logger = logging.getLogger(__name__)
+
+def load_feature_data(store_path=DEFAULT_STORE_PATH, csv_path=FEATURES_CSV):
+    # Prefer the memory-mapped feature store; fall back to the CSV export
+    store = FeatureStore(store_path)
+    if store.exists():
+        return store.to_frame()
+    return pd.read_csv(csv_path)
+
 def split_training_and_testing_data():
+    global GROUND_TRUTH_LABELS
 
     # Read the data
-    data = pd.read_csv('feature_extraction/features.csv')
+    data = load_feature_data()
     GROUND_TRUTH_LABELS = dict(zip(data['fileName'], data['Label']))
-    print("Data: ")
-    print(data.head(2))
+    logger.info("Loaded %d rows of feature data", len(data))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Data:\n%s", data.head(2))
 
 
     # Replace labels with 0 for speech and 1 for music
@@ -34,16 +53,25 @@ def split_training_and_testing_data():
     np.random.seed(random_seed)
     random.seed(random_seed)
 
-    # The directions say to use 1/3 of the data for testing and 2/3 for training
-    x_train, x_test, y_train, y_test = train_test_split(x, y, test_size = 0.33, random_state=random_seed)
+    # The directions say to use 1/3 of the data for testing and 2/3 for training.
+    # Near-duplicate copies of a clip (Audio_Fingerprint) are kept on one side so
+    # they cannot inflate the test scores.
+    groups = duplicate_groups(x['fileName'])
+    if groups is None:
+        x_train, x_test, y_train, y_test = train_test_split(x, y, test_size = 0.33, random_state=random_seed)
+    else:
+        logger.info("Grouping %d files into %d duplicate groups for the split", len(groups), len(set(groups)))
+        splitter = GroupShuffleSplit(n_splits=1, test_size=0.33, random_state=random_seed)
+        train_index, test_index = next(splitter.split(x, y, groups))
+        x_train, x_test = x.iloc[train_index], x.iloc[test_index]
+        y_train, y_test = y.iloc[train_index], y.iloc[test_index]
 
     train_file_names = x_train['fileName'].tolist()
     test_file_names = x_test['fileName'].tolist()
 
-    print("\nTraining Files:")
-    print(train_file_names)
-    print("\nTesting Files:")
-    print(test_file_names)
+    logger.info("%d training files, %d testing files", len(train_file_names), len(test_file_names))
+    logger.debug("Training Files: %s", train_file_names)
+    logger.debug("Testing Files: %s", test_file_names)
 
     # Drop the fileName column
     x_train = x_train.drop(['fileName'], axis=1)
@@ -55,8 +83,8 @@ def evaluate_model(model, x_test, y_test):
 
     y_pred = (model.predict(x_test) > 0.5).astype("int32")
 
-    print('Precision: %.6f' % precision_score(y_test, y_pred, zero_division=1))
-    print('Recall = %.6f' % recall_score(y_test, y_pred, zero_division=1))
+    logger.info('Precision: %.6f', precision_score(y_test, y_pred, zero_division=1))
+    logger.info('Recall = %.6f', recall_score(y_test, y_pred, zero_division=1))
 
 # Reference: https://youtu.be/lrShBmW8Iqs
 # Modified from https://scikit-learn.org/stable/model_persistence.html
@@ -67,14 +95,16 @@ def load_model():
     model = pickle.load(open("SVM_model.pkl", "rb"))
     return model
 
-def train_model():
-    
+def train_model(incremental=False, kernel="rbf"):
+    # incremental=True updates an SGD model with only the new rows (see classifier/incremental.py)
+    if incremental:
+        return _train_model_incremental(kernel)
+
     x_train, x_test, y_train, y_test, train_file_names, test_file_names = split_training_and_testing_data()
-    print("Describe ",x_train.describe())
-    print("min ",x_train.min())
-    print("max: ",x_train.max())
-    print("Before scaling:")
-    print(x_train.head())
+    # Summaries are only rendered when debugging; they are costly on large frames
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Describe\n%s", x_train.describe())
+        logger.debug("Before scaling:\n%s", x_train.head())
 
     # Initialize the MinMaxScaler
     scaler = MinMaxScaler()
@@ -84,8 +114,8 @@ def train_model():
 
     # Transform the testing data using the same scaler
     x_test_scaled = scaler.transform(x_test)
-    print("After scaling:")
-    print(pd.DataFrame(x_train_scaled, columns=x_train.columns).head())
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("After scaling:\n%s", pd.DataFrame(x_train_scaled[:5], columns=x_train.columns))
 
     model = svm.SVC()
     
@@ -95,10 +125,33 @@ def train_model():
     evaluate_model(model, x_test_scaled, y_test)
     save_model(model)
     joblib.dump(scaler, 'scaler.pkl')
+    # The float32 artifact (classifier/svm_artifact.py) is checked against the model on the training rows
+    try:
+        export_artifact(model, scaler, features=x_train.to_numpy())
+    except ValueError as e:
+        logger.warning("Inference artifact not written: %s", e)
     
-    # Get ground truth labels
-    data = pd.read_csv('feature_extraction/features.csv')
+    # Ground truth labels were recorded while splitting the data
+    test_labels = {file: GROUND_TRUTH_LABELS[file] for file in test_file_names}
+
+    return x_train_scaled, x_test_scaled, y_train, y_test, model, train_file_names, test_file_names, test_labels
+
+def _train_model_incremental(kernel):
+    global GROUND_TRUTH_LABELS
+
+    data = load_feature_data()
     GROUND_TRUTH_LABELS = dict(zip(data['fileName'], data['Label']))
+
+    x_train_scaled, x_test_scaled, y_train, y_test, state, train_file_names, test_file_names = train_model_incremental(data, kernel=kernel)
+    model = state.model
+
+    # Until the first training row arrives there is nothing to score or save
+    if state.is_fitted():
+        if len(y_test):
+            evaluate_model(model, x_test_scaled, y_test)
+        save_model(model)
+        joblib.dump(state.scaler, 'scaler.pkl')
+
     test_labels = {file: GROUND_TRUTH_LABELS[file] for file in test_file_names}
 
     return x_train_scaled, x_test_scaled, y_train, y_test, model, train_file_names, test_file_names, test_labels
@@ -0,0 +1,19 @@
+# Feature Subset
+# Pipeline step that keeps a chosen set of feature columns
+
+# Lives in its own module so pickled pipelines load the same way whether
+# they were saved from classifier.model_selection run as a script or
+# imported.
+
+from sklearn.base import BaseEstimator, TransformerMixin
+
+class FeatureSubset(BaseEstimator, TransformerMixin):
+    # Keeps the named DataFrame columns; columns=None keeps them all
+    def __init__(self, columns=None):
+        self.columns = columns
+
+    def fit(self, x, y=None):
+        return self
+
+    def transform(self, x):
+        return x if self.columns is None else x[list(self.columns)]
@@ -0,0 +1,138 @@
+# Incremental Training
+# Updates the model with only the rows that are new since the last run
+
+# A full SVC refit re-splits, re-scales and re-fits every row on each folder
+# load, and kernel SVC cost grows faster than linearly with the number of
+# rows. Incremental mode keeps a hinge-loss SGDClassifier (a linear SVM)
+# and a MinMaxScaler and updates both with partial_fit on the new rows only.
+# kernel="rbf" puts a fixed random Fourier feature map (RBFSampler) in front
+# of the SGD model to approximate SVC's RBF kernel.
+#
+# New rows are assigned to train or test by hashing the file name rather
+# than with train_test_split. Each file therefore stays on the same side as
+# the dataset grows, and test files never leak into the model. Near-duplicate
+# copies (Audio_Fingerprint) hash the name of their canonical file, so every
+# copy of a clip lands on the same side.
+#
+# Trained rows are remembered by file name plus a hash of their features
+# and label, so a file whose content changed is trained on again, and files
+# with the same name in different folders do not hide each other.
+#
+# When partial_fit widens the scaler's range, the scaling of rows already
+# learned shifts slightly. Run a full refit (train_model()) now and then if
+# the feature ranges move a lot.
+
+import hashlib
+import logging
+import os
+import random
+import zlib
+
+import joblib
+import numpy as np
+
+from sklearn.kernel_approximation import RBFSampler
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MinMaxScaler
+
+from feature_extraction.Audio_Fingerprint import duplicate_groups
+
+STATE_PATH = 'incremental_model.pkl'
+TEST_PERCENT = 33
+RANDOM_SEED = 28
+EPOCHS = 20
+RBF_COMPONENTS = 300
+
+logger = logging.getLogger(__name__)
+
+def is_test_file(file_name, test_percent=TEST_PERCENT):
+    # Stable across runs and dataset growth
+    return zlib.crc32(file_name.encode('utf-8')) % 100 < test_percent
+
+def row_keys(rows, feature_columns):
+    # "fileName:digest" per row; the digest covers the feature values and the label
+    values = np.ascontiguousarray(rows[feature_columns].to_numpy(dtype=np.float64))
+    labels = rows["Label"].to_numpy()
+    return [f"{name}:{hashlib.sha1(row.tobytes() + str(label).encode()).hexdigest()[:16]}"
+            for name, row, label in zip(rows["fileName"], values, labels)]
+
+class IncrementalState:
+    def __init__(self, n_features, kernel="rbf"):
+        self.kernel = kernel
+        self.scaler = MinMaxScaler()
+        sgd = SGDClassifier(loss="hinge", alpha=1e-4, random_state=RANDOM_SEED)
+        if kernel == "rbf":
+            sampler = RBFSampler(gamma=1.0, n_components=RBF_COMPONENTS, random_state=RANDOM_SEED)
+            # The random feature map only depends on the number of features
+            sampler.fit(np.zeros((1, n_features)))
+            self.model = Pipeline([("features", sampler), ("sgd", sgd)])
+        else:
+            self.model = Pipeline([("sgd", sgd)])
+        self.trained_rows = set()
+        self.columns = None
+
+    def is_fitted(self):
+        # False until some row has been trained on
+        return hasattr(self.scaler, "n_samples_seen_")
+
+    def partial_fit(self, x, y, epochs=EPOCHS):
+        # Update the scaler, then make a few shuffled passes over the new rows
+        self.scaler.partial_fit(x)
+        x_scaled = self.scaler.transform(x)
+        if "features" in self.model.named_steps:
+            x_scaled = self.model.named_steps["features"].transform(x_scaled)
+        sgd = self.model.named_steps["sgd"]
+        rng = np.random.default_rng(RANDOM_SEED + len(self.trained_rows))
+        y = np.asarray(y)
+        for _ in range(epochs):
+            order = rng.permutation(len(y))
+            sgd.partial_fit(x_scaled[order], y[order], classes=[0, 1])
+
+def load_state(state_path=STATE_PATH):
+    if os.path.exists(state_path):
+        return joblib.load(state_path)
+    return None
+
+def train_model_incremental(data, state_path=STATE_PATH, kernel="rbf"):
+    # data is the feature table (load_feature_data()); returns the same tuple as train_model
+    random.seed(RANDOM_SEED)
+    np.random.seed(RANDOM_SEED)
+
+    data = data.copy()
+    data["Label"] = (data["Label"] == "yes").astype(int)
+    groups = duplicate_groups(data["fileName"])
+    test_mask = np.array([is_test_file(name) for name in (groups or data["fileName"])], dtype=bool)
+    feature_columns = [column for column in data.columns if column not in ("fileName", "Label")]
+
+    state = load_state(state_path)
+    # States from before trained_rows only know file names; start those over
+    if (state is None or state.kernel != kernel or state.columns != feature_columns
+            or not hasattr(state, "trained_rows")):
+        state = IncrementalState(len(feature_columns), kernel=kernel)
+        state.columns = feature_columns
+
+    train = data[~test_mask]
+    test = data[test_mask]
+    keys = np.array(row_keys(train, feature_columns), dtype=object)
+    is_new = np.array([key not in state.trained_rows for key in keys], dtype=bool)
+    new_rows = train[is_new]
+    logger.info("Incremental training: %d new rows, %d already trained.", len(new_rows), len(state.trained_rows))
+
+    if len(new_rows):
+        state.partial_fit(new_rows[feature_columns], new_rows["Label"])
+        state.trained_rows.update(keys[is_new])
+        joblib.dump(state, state_path)
+
+    x_train = train[feature_columns]
+    x_test = test[feature_columns]
+    if not state.is_fitted():
+        # Every row so far hashed into the test split; there is no model to score them with
+        logger.warning("Incremental training: no training rows yet, %d test rows cannot be scored.", len(test))
+        return (np.empty((0, len(feature_columns))), None, train["Label"], test["Label"], state,
+                train["fileName"].tolist(), test["fileName"].tolist())
+    x_train_scaled = state.scaler.transform(x_train)
+    x_test_scaled = state.scaler.transform(x_test) if len(x_test) else np.empty((0, len(feature_columns)))
+
+    return (x_train_scaled, x_test_scaled, train["Label"], test["Label"], state,
+            train["fileName"].tolist(), test["fileName"].tolist())
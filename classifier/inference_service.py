@@ -0,0 +1,248 @@
+# Inference Service
+# Long-lived HTTP server that keeps the SVM and MinMaxScaler in memory
+
+# The model and scaler are unpickled once at startup. Each request extracts
+# features in its own handler thread. The feature vectors then go to a
+# single batching thread, which runs one scaler.transform and one
+# model.predict for everything that arrives within max_wait_ms (up to
+# max_batch rows).
+#
+# Endpoints:
+#   POST /classify      JSON {"path": "..."} or {"paths": ["...", ...]}
+#   POST /classify/pcm  raw mono PCM body; query: rate=16000&format=int16|float32
+#   GET  /stats         request/batch counters and latency percentiles
+#   GET  /health
+#
+# Use the following command to run:
+#   $python -m classifier.inference_service --port 8080
+
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from feature_extraction.Audio_Buffer import AudioBuffer
+from feature_extraction.Extraction_Metrics import configure_logging
+from feature_extraction.Feature_Extractor import extract_features, extract_features_from_buffer, feature_header
+
+MODEL_PATH = 'audio_classifier_model.pkl'
+SCALER_PATH = 'scaler.pkl'
+
+DEFAULT_MAX_BATCH = 64
+DEFAULT_MAX_WAIT_MS = 5.0
+LATENCY_WINDOW = 10000
+
+logger = logging.getLogger(__name__)
+
+PCM_FORMATS = {
+    "int16": (np.dtype('<i2'), 32768.0),
+    "int32": (np.dtype('<i4'), 2147483648.0),
+    "float32": (np.dtype('<f4'), 1.0),
+}
+
+def prediction_label(prediction):
+    return "Music" if prediction == 1 else "Speech"
+
+class Predictor:
+    def __init__(self, model_path=MODEL_PATH, scaler_path=SCALER_PATH, artifact_path=None):
+        # artifact_path: a classifier.svm_artifact .npz used instead of the pickled model and scaler
+        self.columns = feature_header()[1:-1]
+        self.compiled = None
+        if artifact_path is not None:
+            from .svm_artifact import CompiledSVM
+            self.compiled = CompiledSVM.load(artifact_path)
+            return
+        self.model = joblib.load(model_path)
+        self.scaler = joblib.load(scaler_path)
+
+    def predict(self, features):
+        # features: (n_files, n_features); one transform and one predict for the whole batch
+        if self.compiled is not None:
+            return self.compiled.predict(features)
+        frame = pd.DataFrame(np.asarray(features, dtype=np.float64).reshape(-1, len(self.columns)), columns=self.columns)
+        return self.model.predict(self.scaler.transform(frame))
+
+    def decision_function(self, features):
+        # Signed distance from the decision boundary; positive means music
+        if self.compiled is not None:
+            return self.compiled.decision_function(features)
+        frame = pd.DataFrame(np.asarray(features, dtype=np.float64).reshape(-1, len(self.columns)), columns=self.columns)
+        return self.model.decision_function(self.scaler.transform(frame))
+
+class BatchingPredictor:
+    # Collects feature vectors from many threads into single predict calls
+    def __init__(self, predictor, max_batch=DEFAULT_MAX_BATCH, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+        self.predictor = predictor
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.rows = 0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, features):
+        future = Future()
+        self._queue.put((features, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                predictions = self.predictor.predict([features for features, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.rows += len(batch)
+            for (_, future), prediction in zip(batch, predictions):
+                future.set_result(int(prediction))
+
+class LatencyTracker:
+    def __init__(self, window=LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def record(self, seconds, error=False):
+        with self._lock:
+            self._samples.append(seconds)
+            self.requests += 1
+            if error:
+                self.errors += 1
+
+    def percentiles(self):
+        with self._lock:
+            samples = np.array(self._samples)
+        if len(samples) == 0:
+            return {}
+        p50, p90, p99 = np.percentile(samples, [50, 90, 99]) * 1000.0
+        return {"p50_ms": p50, "p90_ms": p90, "p99_ms": p99, "max_ms": samples.max() * 1000.0}
+
+class InferenceService:
+    def __init__(self, predictor, max_batch=DEFAULT_MAX_BATCH, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+        self.batcher = BatchingPredictor(predictor, max_batch=max_batch, max_wait_ms=max_wait_ms)
+        self.latency = LatencyTracker()
+        self.started = time.time()
+
+    def classify_paths(self, paths):
+        futures = [(path, self.batcher.submit(extract_features(path))) for path in paths]
+        results = []
+        for path, future in futures:
+            prediction = future.result()
+            results.append({"file": path, "prediction": prediction, "label": prediction_label(prediction)})
+        return results
+
+    def classify_pcm(self, body, rate, pcm_format="int16"):
+        dtype, scale = PCM_FORMATS[pcm_format]
+        samples = (np.frombuffer(body, dtype=dtype).astype(np.float32)) / np.float32(scale)
+        features = extract_features_from_buffer(AudioBuffer(samples, rate))
+        prediction = self.batcher.submit(features).result()
+        return {"prediction": prediction, "label": prediction_label(prediction)}
+
+    def stats(self):
+        batches = self.batcher.batches
+        return {
+            "uptime_s": time.time() - self.started,
+            "requests": self.latency.requests,
+            "errors": self.latency.errors,
+            "batches": batches,
+            "mean_batch_size": self.batcher.rows / batches if batches else 0.0,
+            "latency": self.latency.percentiles(),
+        }
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == "/stats":
+                self._send(200, service.stats())
+            elif path == "/health":
+                self._send(200, {"status": "ok"})
+            else:
+                self._send(404, {"error": f"Unknown endpoint {path}"})
+
+        def do_POST(self):
+            start = time.perf_counter()
+            url = urlparse(self.path)
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                if url.path == "/classify":
+                    request = json.loads(body)
+                    paths = request["paths"] if "paths" in request else [request["path"]]
+                    self._send(200, {"results": service.classify_paths(paths)})
+                elif url.path == "/classify/pcm":
+                    query = parse_qs(url.query)
+                    rate = int(query.get("rate", ["16000"])[0])
+                    pcm_format = query.get("format", ["int16"])[0]
+                    self._send(200, service.classify_pcm(body, rate, pcm_format))
+                else:
+                    self._send(404, {"error": f"Unknown endpoint {url.path}"})
+                    return
+            except Exception as e:
+                service.latency.record(time.perf_counter() - start, error=True)
+                self._send(400, {"error": f"{type(e).__name__}: {e}"})
+                return
+            service.latency.record(time.perf_counter() - start)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve music/speech predictions over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--scaler", default=SCALER_PATH)
+    parser.add_argument("--artifact", help="predict with this svm_artifact .npz instead of --model/--scaler")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS)
+    parser.add_argument("--log-json", action="store_true", help="log one JSON object per line")
+    args = parser.parse_args()
+    configure_logging(json_format=args.log_json)
+
+    service = InferenceService(Predictor(args.model, args.scaler, args.artifact), max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    logger.info("Serving predictions on http://%s:%d", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
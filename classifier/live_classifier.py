@@ -0,0 +1,307 @@
+# Live Classifier
+# Music/speech decisions over a live PCM stream instead of whole files
+
+# Input arrives in small blocks from stdin, a TCP socket, a sound device or a
+# file replayed as if it were live. Each block is resampled to TARGET_SR
+# with a streaming soxr resampler and written into a fixed-size ring buffer.
+# Every hop_s seconds the last window_s seconds are copied into one
+# preallocated window array. That window goes through the same
+# extract_features_from_buffer that pipeline uses, and the result through
+# the same scaler and model as the inference service.
+#
+# Buffers are allocated once. The ring buffer, the window and the raw PCM
+# read buffers are reused for every block. The resampler output and the
+# feature arrays inside the extractors are still allocated per call.
+#
+# Per-window decisions are smoothed with a majority vote over the last
+# smooth windows. The smoothed label only changes when the new label wins
+# outright, so it does not flicker on ties. Latency is measured from the
+# arrival of the block that completes a window to its decision. The target
+# is TARGET_LATENCY_MS per window.
+#
+# Output is one JSON object per window on stdout.
+#
+# Use the following command to run:
+#   $python -m classifier.live_classifier --source file --input audio/music/mu1.wav --realtime
+#   $arecord -f S16_LE -r 16000 -c 1 | python -m classifier.live_classifier --source stdin --rate 16000
+#   $python -m classifier.live_classifier --source socket --port 9000 --rate 16000
+#   $python -m classifier.live_classifier --source device --rate 16000     (needs sounddevice)
+
+import argparse
+import json
+import logging
+import queue
+import socket
+import sys
+import time
+from collections import deque
+
+import numpy as np
+import soundfile as sf
+import soxr
+
+from feature_extraction.Audio_Buffer import AudioBuffer, TARGET_SR
+from feature_extraction.Extraction_Metrics import configure_logging
+from feature_extraction.Feature_Extractor import extract_features_from_buffer
+from .inference_service import MODEL_PATH, PCM_FORMATS, SCALER_PATH, Predictor, prediction_label
+
+DEFAULT_WINDOW_S = 3.0
+DEFAULT_HOP_S = 0.5
+DEFAULT_SMOOTH = 5
+DEFAULT_BLOCK_MS = 20
+TARGET_LATENCY_MS = 100.0
+
+logger = logging.getLogger(__name__)
+
+class RingBuffer:
+    # Fixed-capacity float32 history of the most recent samples
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self._write = 0
+        self.filled = 0
+
+    def write(self, block):
+        if len(block) >= self.capacity:
+            block = block[-self.capacity:]
+        n = len(block)
+        first = min(n, self.capacity - self._write)
+        self._data[self._write:self._write + first] = block[:first]
+        self._data[:n - first] = block[first:]
+        self._write = (self._write + n) % self.capacity
+        self.filled = min(self.capacity, self.filled + n)
+
+    def read_into(self, out):
+        # Copies the last len(out) samples, oldest first
+        n = len(out)
+        start = (self._write - n) % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self._data[start:start + first]
+        out[first:] = self._data[:n - first]
+        return out
+
+class Smoother:
+    # Majority vote over the last n raw decisions
+    def __init__(self, n=DEFAULT_SMOOTH):
+        self._history = deque(maxlen=max(1, n))
+        self.label = None
+
+    def update(self, prediction):
+        self._history.append(int(prediction))
+        music = sum(self._history)
+        speech = len(self._history) - music
+        if music > speech:
+            self.label = 1
+        elif speech > music:
+            self.label = 0
+        elif self.label is None:
+            self.label = int(prediction)
+        return self.label
+
+class LiveClassifier:
+    def __init__(self, predictor, rate, window_s=DEFAULT_WINDOW_S, hop_s=DEFAULT_HOP_S, smooth=DEFAULT_SMOOTH):
+        self.predictor = predictor
+        self.rate = rate
+        self.window_length = int(round(window_s * TARGET_SR))
+        self.hop_length = int(round(hop_s * TARGET_SR))
+        # A zero hop would make feed() decide on the same window forever
+        if self.hop_length < 1:
+            raise ValueError(f"hop_s must be at least one sample at {TARGET_SR} Hz, got {hop_s}")
+        if self.window_length < self.hop_length:
+            raise ValueError(f"window_s ({window_s}) must not be shorter than hop_s ({hop_s})")
+        self._resampler = None
+        if rate != TARGET_SR:
+            self._resampler = soxr.ResampleStream(rate, TARGET_SR, 1, dtype='float32', quality='HQ')
+        self._ring = RingBuffer(self.window_length)
+        self._window = np.zeros(self.window_length, dtype=np.float32)
+        self._until_hop = self.window_length  # the first decision needs a full window
+        self._received = 0  # samples at TARGET_SR so far
+        self.smoother = Smoother(smooth)
+        self.latencies = []
+
+        # librosa's first calls compile and cache; keep that out of the first decision
+        self.predictor.predict([extract_features_from_buffer(AudioBuffer(self._window, TARGET_SR))])
+
+    def feed(self, block, arrived=None):
+        # block: mono float32 at self.rate; returns the decisions it completed
+        if arrived is None:
+            arrived = time.perf_counter()
+        if self._resampler is not None:
+            block = self._resampler.resample_chunk(block)
+        decisions = []
+        offset = 0
+        while offset < len(block):
+            n = min(len(block) - offset, self._until_hop)
+            self._ring.write(block[offset:offset + n])
+            offset += n
+            self._received += n
+            self._until_hop -= n
+            if self._until_hop == 0:
+                self._until_hop = self.hop_length
+                decisions.append(self._classify(arrived))
+        return decisions
+
+    def _classify(self, arrived):
+        self._ring.read_into(self._window)
+        features = extract_features_from_buffer(AudioBuffer(self._window, TARGET_SR))
+        prediction = int(self.predictor.predict([features])[0])
+        previous = self.smoother.label
+        smoothed = self.smoother.update(prediction)
+        latency_ms = (time.perf_counter() - arrived) * 1000.0
+        self.latencies.append(latency_ms)
+        end_s = self._received / TARGET_SR
+        return {
+            "start_s": round(end_s - self.window_length / TARGET_SR, 3),
+            "end_s": round(end_s, 3),
+            "prediction": prediction,
+            "label": prediction_label(smoothed),
+            "raw_label": prediction_label(prediction),
+            "changed": smoothed != previous,
+            "latency_ms": round(latency_ms, 2),
+        }
+
+    def latency_summary(self):
+        if not self.latencies:
+            return {}
+        latencies = np.array(self.latencies)
+        p50, p99 = np.percentile(latencies, [50, 99])
+        return {"windows": len(latencies), "p50_ms": p50, "p99_ms": p99, "max_ms": latencies.max()}
+
+# Sources yield mono float32 blocks. The same output array is reused for
+# every block, so consume each one before asking for the next.
+
+def _read_full(read_into, buffer):
+    # Fill buffer from a blocking reader; returns the bytes read (short only at EOF)
+    view = memoryview(buffer)
+    filled = 0
+    while filled < len(buffer):
+        n = read_into(view[filled:])
+        if not n:
+            break
+        filled += n
+    return filled
+
+def _pcm_blocks(read_into, block_size, pcm_format):
+    dtype, scale = PCM_FORMATS[pcm_format]
+    raw = bytearray(block_size * dtype.itemsize)
+    samples = np.frombuffer(raw, dtype=dtype)
+    out = np.empty(block_size, dtype=np.float32)
+    while True:
+        n = _read_full(read_into, raw) // dtype.itemsize
+        if n == 0:
+            return
+        np.multiply(samples[:n], np.float32(1.0 / scale), out=out[:n], casting='unsafe')
+        yield out[:n]
+        if n < block_size:
+            return
+
+def stdin_source(block_size, pcm_format="int16"):
+    return _pcm_blocks(sys.stdin.buffer.readinto, block_size, pcm_format)
+
+def socket_source(host, port, block_size, pcm_format="int16"):
+    # Listens for one client that sends raw mono PCM, then reads until it disconnects
+    with socket.create_server((host, port)) as server:
+        logger.info("Waiting for a PCM stream on %s:%d", host, port)
+        connection, address = server.accept()
+        logger.info("Streaming from %s:%d", *address[:2])
+        with connection:
+            yield from _pcm_blocks(connection.recv_into, block_size, pcm_format)
+
+def file_source(path, block_size, realtime=False):
+    # Replays a file in blocks; realtime=True paces the blocks like a live feed
+    with sf.SoundFile(path) as audio_file:
+        rate = audio_file.samplerate
+        out = np.empty(block_size, dtype=np.float32)
+        start = time.perf_counter()
+        sent = 0
+        for block in audio_file.blocks(blocksize=block_size, dtype='float32', always_2d=True):
+            n = len(block)
+            if block.shape[1] > 1:
+                np.mean(block, axis=1, out=out[:n])
+            else:
+                out[:n] = block[:, 0]
+            sent += n
+            if realtime:
+                delay = start + sent / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            yield out[:n]
+
+def device_source(rate, block_size, device=None):
+    # Sound card input through the optional sounddevice package
+    import sounddevice
+    blocks = queue.Queue()
+
+    def callback(indata, frames, time_info, status):
+        if status:
+            logger.warning("Input stream: %s", status)
+        blocks.put(indata[:, 0].copy())
+
+    with sounddevice.InputStream(samplerate=rate, blocksize=block_size, channels=1, dtype='float32',
+                                 device=device, callback=callback):
+        while True:
+            yield blocks.get()
+
+def run(classifier, source, output=sys.stdout):
+    for block in source:
+        for decision in classifier.feed(block):
+            output.write(json.dumps(decision) + "\n")
+            output.flush()
+
+    summary = classifier.latency_summary()
+    if summary:
+        logger.info("Latency over %d windows: p50 %.1f ms, p99 %.1f ms, max %.1f ms",
+                    summary["windows"], summary["p50_ms"], summary["p99_ms"], summary["max_ms"])
+        if summary["p99_ms"] > TARGET_LATENCY_MS:
+            logger.warning("p99 latency is above the %.0f ms target", TARGET_LATENCY_MS)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify a live audio stream as music or speech")
+    parser.add_argument("--source", choices=("file", "stdin", "socket", "device"), default="stdin")
+    parser.add_argument("--input", help="file to replay with --source file")
+    parser.add_argument("--rate", type=int, default=16000, help="sampling rate of raw PCM input")
+    parser.add_argument("--format", choices=sorted(PCM_FORMATS), default="int16", help="raw PCM sample format")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--device", help="sounddevice input device")
+    parser.add_argument("--realtime", action="store_true", help="pace file replay at the file's own rate")
+    parser.add_argument("--window", type=float, default=DEFAULT_WINDOW_S, help="seconds of audio per decision")
+    parser.add_argument("--hop", type=float, default=DEFAULT_HOP_S, help="seconds between decisions")
+    parser.add_argument("--smooth", type=int, default=DEFAULT_SMOOTH, help="windows in the majority vote")
+    parser.add_argument("--block-ms", type=float, default=DEFAULT_BLOCK_MS, help="input block length")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--scaler", default=SCALER_PATH)
+    parser.add_argument("--artifact", help="predict with this svm_artifact .npz instead of --model/--scaler")
+    parser.add_argument("--log-json", action="store_true", help="log one JSON object per line")
+    args = parser.parse_args()
+    configure_logging(json_format=args.log_json)
+
+    rate = args.rate
+    if args.source == "file":
+        if not args.input:
+            parser.error("--source file needs --input")
+        rate = sf.info(args.input).samplerate
+    block_size = max(1, int(rate * args.block_ms / 1000.0))
+
+    predictor = Predictor(args.model, args.scaler, args.artifact)
+    try:
+        classifier = LiveClassifier(predictor, rate, window_s=args.window, hop_s=args.hop, smooth=args.smooth)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.source == "file":
+        source = file_source(args.input, block_size, realtime=args.realtime)
+    elif args.source == "stdin":
+        source = stdin_source(block_size, args.format)
+    elif args.source == "socket":
+        source = socket_source(args.host, args.port, block_size, args.format)
+    else:
+        source = device_source(rate, block_size, args.device)
+    try:
+        run(classifier, source)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# Model Selection
+# Cross-validated grid or random search over the SVM and the feature subset
+
+# train_model scores one SVC() with default C/gamma on one train_test_split.
+# With 40 files, its precision moves between 0.33 and 0.67 depending on the
+# seed alone. This module picks hyperparameters and feature columns by
+# repeated stratified k-fold cross-validation instead:
+#   - the candidate is a Pipeline (FeatureSubset -> MinMaxScaler -> SVC), so
+#     the scaler is fitted inside every training fold and never sees the
+#     fold it is scored on
+#   - the pipeline is built with memory=<cache dir>, so each fold's fitted
+#     subset and scaler are computed once and reused by every C/gamma/kernel
+#     candidate on that fold
+#   - folds and candidates run in parallel with n_jobs
+#   - precision, recall, F1 and accuracy are all recorded; the best
+#     candidate is chosen by refit_metric (F1 by default)
+# The best pipeline is refitted on every row and saved with its CV scores.
+# With export=True it is also written as the model/scaler pair the GUI,
+# the inference service and batch prediction load: the scaler is the
+# subset + MinMaxScaler steps and the model is the SVC, so callers keep
+# passing all feature columns. The float32 inference artifact
+# (classifier/svm_artifact.py) is regenerated from the same pair.
+#
+# Use the following command to run:
+#   $python -m classifier.model_selection --n-jobs -1
+#   $python -m classifier.model_selection --search random --n-iter 200 --export
+
+import argparse
+import json
+import logging
+import shutil
+import tempfile
+
+import joblib
+import numpy as np
+from sklearn.metrics import make_scorer, precision_score
+from sklearn.model_selection import GridSearchCV, RandomizedSearchCV, RepeatedStratifiedKFold, StratifiedGroupKFold
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MinMaxScaler
+from sklearn.svm import SVC
+from scipy.stats import loguniform
+
+from feature_extraction.Audio_Fingerprint import duplicate_groups
+from feature_extraction.Extraction_Metrics import configure_logging
+from feature_extraction.Feature_Extractor import feature_header
+from .classifier import load_feature_data
+from .feature_subset import FeatureSubset
+from .inference_service import MODEL_PATH, SCALER_PATH
+from .svm_artifact import ARTIFACT_PATH, export_artifact
+
+PIPELINE_PATH = 'best_pipeline.pkl'
+RESULTS_PATH = 'model_selection.json'
+RANDOM_SEED = 28
+N_SPLITS = 5
+N_REPEATS = 3
+SCORING = ("precision", "recall", "f1", "accuracy")
+
+# A candidate that never predicts music scores 0 precision on that fold
+SCORERS = {
+    "precision": make_scorer(precision_score, zero_division=0),
+    "recall": "recall",
+    "f1": "f1",
+    "accuracy": "accuracy",
+}
+
+logger = logging.getLogger(__name__)
+
+FEATURE_COLUMNS = feature_header()[1:-1]
+MFCC_COLUMNS = [column for column in FEATURE_COLUMNS if column.startswith("MFCC_")]
+
+# None keeps every column
+FEATURE_SUBSETS = {
+    "all": None,
+    "mfcc": tuple(MFCC_COLUMNS),
+    "spectral": ("Spectral_Centroid",) + tuple(MFCC_COLUMNS),
+    "no_energy": tuple(column for column in FEATURE_COLUMNS if column != "Avg_Energy"),
+    "summary": ("Avg_Energy", "Spectral_Centroid", "Zero_Crossing") + tuple(MFCC_COLUMNS[:5]),
+}
+
+C_GRID = [0.1, 1.0, 10.0, 100.0, 1000.0]
+GAMMA_GRID = ["scale", 0.01, 0.1, 1.0, 10.0]
+
+def make_pipeline(memory=None):
+    return Pipeline([
+        ("subset", FeatureSubset()),
+        ("scale", MinMaxScaler()),
+        ("svm", SVC()),
+    ], memory=memory)
+
+def search_space(search="grid", subsets=FEATURE_SUBSETS):
+    subset_values = list(subsets.values())
+    if search == "grid":
+        return [
+            {"subset__columns": subset_values, "svm__kernel": ["rbf"], "svm__C": C_GRID, "svm__gamma": GAMMA_GRID},
+            {"subset__columns": subset_values, "svm__kernel": ["linear"], "svm__C": C_GRID},
+        ]
+    return [
+        {"subset__columns": subset_values, "svm__kernel": ["rbf"],
+         "svm__C": loguniform(1e-2, 1e4), "svm__gamma": loguniform(1e-3, 1e2)},
+        {"subset__columns": subset_values, "svm__kernel": ["linear"], "svm__C": loguniform(1e-2, 1e4)},
+    ]
+
+def subset_name(columns, subsets=FEATURE_SUBSETS):
+    for name, value in subsets.items():
+        if value == columns:
+            return name
+    return ",".join(columns)
+
+def _readable(params):
+    params = dict(params)
+    params["subset__columns"] = subset_name(params["subset__columns"])
+    return {key: (float(value) if isinstance(value, np.floating) else value) for key, value in params.items()}
+
+def select_model(data=None, search="grid", n_iter=60, n_splits=N_SPLITS, n_repeats=N_REPEATS, n_jobs=None,
+                 refit_metric="f1", cache_dir=None, random_state=RANDOM_SEED):
+    # Returns (fitted search object, results summary dict)
+    if data is None:
+        data = load_feature_data()
+    x = data[FEATURE_COLUMNS]
+    y = (data["Label"] == "yes").astype(int)
+
+    # Copies of one clip (Audio_Fingerprint) must not sit on both sides of a fold.
+    # sklearn has no repeated grouped splitter, so grouped CV runs one repeat.
+    groups = duplicate_groups(data["fileName"])
+    if groups is None:
+        cv = RepeatedStratifiedKFold(n_splits=n_splits, n_repeats=n_repeats, random_state=random_state)
+    else:
+        cv = StratifiedGroupKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+        n_repeats = 1
+        logger.info("Grouped cross-validation over %d duplicate groups", len(set(groups)))
+    temporary = cache_dir is None
+    cache_dir = cache_dir or tempfile.mkdtemp(prefix='model_selection_')
+    try:
+        pipeline = make_pipeline(memory=joblib.Memory(cache_dir, verbose=0))
+        space = search_space(search)
+        if search == "grid":
+            searcher = GridSearchCV(pipeline, space, scoring=SCORERS, refit=refit_metric, cv=cv, n_jobs=n_jobs)
+        else:
+            searcher = RandomizedSearchCV(pipeline, space, n_iter=n_iter, scoring=SCORERS, refit=refit_metric,
+                                          cv=cv, n_jobs=n_jobs, random_state=random_state)
+        searcher.fit(x, y, groups=groups)
+    finally:
+        if temporary:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+    # The refitted pipeline must not point at a cache directory that is gone
+    searcher.best_estimator_.memory = None
+    return searcher, summarize(searcher, refit_metric, len(data), n_splits, n_repeats)
+
+def summarize(searcher, refit_metric, n_rows, n_splits, n_repeats, top=10):
+    results = searcher.cv_results_
+    ranking = np.argsort(results[f"rank_test_{refit_metric}"], kind="stable")[:top]
+    candidates = []
+    for index in ranking:
+        candidate = {"params": _readable(results["params"][index])}
+        for metric in SCORING:
+            candidate[metric] = {"mean": float(results[f"mean_test_{metric}"][index]),
+                                 "std": float(results[f"std_test_{metric}"][index])}
+        candidates.append(candidate)
+    return {
+        "rows": n_rows,
+        "cv": {"n_splits": n_splits, "n_repeats": n_repeats},
+        "refit_metric": refit_metric,
+        "candidates_evaluated": len(results["params"]),
+        "best_params": _readable(searcher.best_params_),
+        "best": candidates[0],
+        "top": candidates,
+    }
+
+def save_selection(searcher, summary, pipeline_path=PIPELINE_PATH, results_path=RESULTS_PATH, export=False, features=None):
+    # features: raw rows the exported artifact is checked against
+    best = searcher.best_estimator_
+    joblib.dump(best, pipeline_path)
+    with open(results_path, 'w') as f:
+        json.dump(summary, f, indent=2)
+    if export:
+        # Subset + scaler act as the "scaler", so callers keep passing every column
+        joblib.dump(best[:-1], SCALER_PATH)
+        joblib.dump(best[-1], MODEL_PATH)
+        try:
+            export_artifact(best[-1], best[:-1], features=features)
+        except ValueError as e:
+            logger.warning("Inference artifact not written: %s", e)
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-validated hyperparameter and feature subset search")
+    parser.add_argument("--search", choices=("grid", "random"), default="grid")
+    parser.add_argument("--n-iter", type=int, default=60, help="candidates for --search random")
+    parser.add_argument("--splits", type=int, default=N_SPLITS)
+    parser.add_argument("--repeats", type=int, default=N_REPEATS)
+    parser.add_argument("--n-jobs", type=int, default=None, help="-1 uses every CPU")
+    parser.add_argument("--refit", choices=SCORING, default="f1", help="metric that picks the best candidate")
+    parser.add_argument("--cache-dir", help="keep fitted fold transformers here between runs")
+    parser.add_argument("--output", default=PIPELINE_PATH)
+    parser.add_argument("--results", default=RESULTS_PATH)
+    parser.add_argument("--export", action="store_true", help=f"also write {MODEL_PATH}, {SCALER_PATH} and {ARTIFACT_PATH}")
+    args = parser.parse_args()
+    configure_logging()
+
+    data = load_feature_data()
+    searcher, summary = select_model(data, search=args.search, n_iter=args.n_iter, n_splits=args.splits,
+                                     n_repeats=args.repeats, n_jobs=args.n_jobs, refit_metric=args.refit,
+                                     cache_dir=args.cache_dir)
+    save_selection(searcher, summary, args.output, args.results, export=args.export,
+                   features=data[FEATURE_COLUMNS].to_numpy())
+
+    best = summary["best"]
+    logger.info("Evaluated %d candidates over %d x %d folds", summary["candidates_evaluated"],
+                summary["cv"]["n_repeats"], summary["cv"]["n_splits"])
+    logger.info("Best: %s", summary["best_params"])
+    for metric in SCORING:
+        logger.info("  %-9s %.3f +/- %.3f", metric, best[metric]["mean"], best[metric]["std"])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# Segment Timeline
+# Music/speech timelines for files that mix both, instead of one label per file
+
+# Each file is decoded once and reduced to one feature row per overlapping
+# window with Feature_Segments.segment_features. The rows of all windows
+# go through a single batched decision_function. Each window's margin d is
+# mapped to a music score 1 / (1 + exp(-d)). This is a monotone squashing
+# of the SVM margin, not a calibrated probability. Wherever windows
+# overlap, their scores are averaged. Each stretch of audio is labelled
+# music when its averaged score is at least 0.5. Adjacent stretches with
+# the same label are merged into segments with (start, end, label,
+# confidence). The confidence is the duration-weighted mean of max(score,
+# 1 - score).
+#
+# Use the following command to run:
+#   $python -m classifier.segment_timeline broadcast.wav --window 3 --hop 1 --output timeline.json
+#   $python -m classifier.segment_timeline audio/ --format csv --output timeline.csv
+
+import argparse
+import csv
+import json
+import logging
+import sys
+
+import numpy as np
+
+from feature_extraction.Audio_Buffer import load_audio
+from feature_extraction.Extraction_Metrics import configure_logging
+from feature_extraction.Feature_Segments import DEFAULT_HOP_S, DEFAULT_WINDOW_S, segment_features
+from .batch_predict import collect_files
+from .inference_service import MODEL_PATH, SCALER_PATH, Predictor, prediction_label
+
+logger = logging.getLogger(__name__)
+
+def merge_windows(starts, ends, scores, duration):
+    # Averages overlapping window scores and merges equal labels into segments
+    ends = np.minimum(ends, duration)
+    ends[-1] = duration
+    bounds = np.unique(np.concatenate(([0.0], starts, ends)))
+    first = np.searchsorted(bounds, starts)
+    last = np.searchsorted(bounds, ends)
+
+    # Difference arrays over the elementary intervals between bounds
+    score_delta = np.zeros(len(bounds))
+    count_delta = np.zeros(len(bounds))
+    np.add.at(score_delta, first, scores)
+    np.add.at(score_delta, last, -scores)
+    np.add.at(count_delta, first, 1)
+    np.add.at(count_delta, last, -1)
+    counts = np.cumsum(count_delta)[:-1]
+    interval_scores = np.cumsum(score_delta)[:-1] / np.maximum(counts, 1)
+    lengths = np.diff(bounds)
+
+    music = interval_scores >= 0.5
+    confidence = np.where(music, interval_scores, 1.0 - interval_scores)
+    # Segment boundaries are where the label changes
+    changes = np.flatnonzero(music[1:] != music[:-1]) + 1
+    segment_starts = np.concatenate(([0], changes))
+    segment_ends = np.concatenate((changes, [len(music)]))
+
+    segments = []
+    for a, b in zip(segment_starts, segment_ends):
+        weights = lengths[a:b]
+        segments.append({
+            "start": round(float(bounds[a]), 3),
+            "end": round(float(bounds[b]), 3),
+            "label": prediction_label(int(music[a])),
+            "confidence": round(float(np.average(confidence[a:b], weights=weights)), 4),
+        })
+    return segments
+
+def classify_timeline(path, predictor, window_s=DEFAULT_WINDOW_S, hop_s=DEFAULT_HOP_S):
+    buffer = load_audio(path)
+    starts, ends, features = segment_features(buffer, window_s=window_s, hop_s=hop_s)
+    scores = 1.0 / (1.0 + np.exp(-predictor.decision_function(features)))
+    duration = len(buffer.samples) / buffer.sampling_rate
+    return {"file": path, "duration": round(duration, 3), "segments": merge_windows(starts, ends, scores, duration)}
+
+def write_timelines(timelines, output, output_format="json"):
+    if output_format == "csv":
+        writer = csv.writer(output)
+        writer.writerow(["file", "start", "end", "label", "confidence"])
+        for timeline in timelines:
+            for segment in timeline["segments"]:
+                writer.writerow([timeline["file"], segment["start"], segment["end"], segment["label"], segment["confidence"]])
+    else:
+        json.dump(timelines, output, indent=2)
+        output.write("\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Timestamped music/speech segments for each file")
+    parser.add_argument("inputs", nargs="+", help="WAV files or directories")
+    parser.add_argument("--window", type=float, default=DEFAULT_WINDOW_S, help="seconds per classified window")
+    parser.add_argument("--hop", type=float, default=DEFAULT_HOP_S, help="seconds between window starts")
+    parser.add_argument("--format", choices=("json", "csv"), default="json")
+    parser.add_argument("--output", help="write here instead of stdout")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--scaler", default=SCALER_PATH)
+    parser.add_argument("--artifact", help="predict with this svm_artifact .npz instead of --model/--scaler")
+    args = parser.parse_args()
+    configure_logging()
+
+    predictor = Predictor(args.model, args.scaler, args.artifact)
+    timelines = []
+    failed = 0
+    for path in collect_files(args.inputs):
+        try:
+            timelines.append(classify_timeline(path, predictor, window_s=args.window, hop_s=args.hop))
+        except Exception as e:
+            failed += 1
+            logger.error("Error during segmentation of %s: %s", path, e, extra={"path": path})
+
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            write_timelines(timelines, f, args.format)
+    else:
+        write_timelines(timelines, sys.stdout, args.format)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+# SVM Artifact
+# The trained SVC and its scaler packed into float32 arrays for batched NumPy inference
+
+# Predicting with the pickled model means unpickling the SVC and the
+# MinMaxScaler (which imports sklearn), then building a DataFrame and going
+# through scaler.transform and SVC.predict for every request. For a 16-column
+# model with a few dozen support vectors, that overhead is far larger than
+# the arithmetic. export_artifact writes everything the decision function
+# needs into one .npz of contiguous arrays, and CompiledSVM evaluates it
+# with a few matrix operations:
+#   - the scaler is folded in: MinMaxScaler computes x * scale + min, so for
+#     the RBF kernel the features are multiplied by sqrt(gamma) * scale and
+#     the support vectors are stored as sqrt(gamma) * (sv - min). Then
+#     K(x, sv) = exp(-|z - s|^2) with z = x * w, and the kernel matrix comes
+#     from |z|^2 - 2 z.s + |s|^2 in a single matrix product per batch
+#   - a linear kernel collapses to one weight vector and intercept
+#   - a FeatureSubset step in front of the scaler (model_selection --export)
+#     becomes a column index, so callers still pass every feature column
+#   - loading is np.load of a few small arrays; sklearn is not imported
+# Arithmetic is float32, so decision values differ from sklearn by about
+# 1e-6. export_artifact checks the artifact against sklearn on the feature
+# table and refuses to write it when they disagree (verify_artifact).
+#
+# Approximate mode (prune_tolerance) drops the support vectors with the
+# smallest |dual coefficient| while their sum stays within the tolerance.
+# An RBF kernel value is never above 1, so for every input the decision
+# value moves by at most that sum. Only inputs closer than the tolerance to
+# the boundary can change label. The bound is stored in the artifact as
+# max_decision_error.
+#
+# Use the following command to run:
+#   $python -m classifier.svm_artifact
+#   $python -m classifier.svm_artifact --prune-tolerance 0.05 --output audio_classifier_model_pruned.npz
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+ARTIFACT_PATH = 'audio_classifier_model.npz'
+ARTIFACT_VERSION = 1
+DEFAULT_BATCH_SIZE = 4096
+
+# Allowed |decision difference| from sklearn caused by float32 arithmetic alone,
+# per unit of the summed |dual coefficients| for RBF models
+FLOAT32_TOLERANCE = 1e-4
+
+logger = logging.getLogger(__name__)
+
+class CompiledSVM:
+    def __init__(self, arrays, meta):
+        self.meta = meta
+        self.kernel = meta["kernel"]
+        self.n_features = meta["n_features"]
+        self.max_decision_error = meta.get("max_decision_error", 0.0)
+        self.columns = arrays.get("columns")  # None keeps every column
+        self.weights = arrays["weights"]
+        self.intercept = float(arrays["intercept"])
+        self.classes = arrays["classes"]
+        if self.kernel == "rbf":
+            self.support = arrays["support"]
+            self.dual_coef = arrays["dual_coef"]
+            self.support_norms = np.einsum('ij,ij->i', self.support, self.support)
+
+    @classmethod
+    def load(cls, path=ARTIFACT_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+        meta = json.loads(str(arrays.pop("meta")))
+        if meta.get("version") != ARTIFACT_VERSION:
+            raise ValueError(f"{path} was written by an incompatible version of svm_artifact")
+        return cls(arrays, meta)
+
+    def save(self, path=ARTIFACT_PATH):
+        arrays = {"weights": self.weights, "intercept": np.float64(self.intercept), "classes": self.classes}
+        if self.columns is not None:
+            arrays["columns"] = self.columns
+        if self.kernel == "rbf":
+            arrays["support"] = self.support
+            arrays["dual_coef"] = self.dual_coef
+        with open(path, 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(self.meta)), **arrays)
+
+    def _prepare(self, features):
+        x = np.asarray(features, dtype=np.float32).reshape(-1, self.n_features)
+        if self.columns is not None:
+            x = x[:, self.columns]
+        return x
+
+    def decision_function(self, features, batch_size=DEFAULT_BATCH_SIZE):
+        # Signed distance from the decision boundary for each row; positive means classes[1]
+        x = self._prepare(features)
+        if self.kernel == "linear":
+            return (x @ self.weights + np.float32(self.intercept)).astype(np.float64)
+        out = np.empty(len(x), dtype=np.float64)
+        for start in range(0, len(x), batch_size):
+            z = x[start:start + batch_size] * self.weights
+            distances = z @ self.support.T
+            distances *= -2.0
+            distances += np.einsum('ij,ij->i', z, z)[:, None]
+            distances += self.support_norms
+            np.maximum(distances, 0.0, out=distances)  # rounding can leave tiny negatives
+            np.exp(-distances, out=distances)
+            out[start:start + len(z)] = distances @ self.dual_coef + self.intercept
+        return out
+
+    def float_tolerance(self):
+        # Each kernel value carries a float32 rounding error, weighted by its dual coefficient
+        if self.kernel == "rbf":
+            return FLOAT32_TOLERANCE * (1.0 + float(np.abs(self.dual_coef).sum()))
+        return FLOAT32_TOLERANCE
+
+    def predict(self, features):
+        return self.classes[(self.decision_function(features) > 0).astype(np.intp)]
+
+    def prune(self, tolerance):
+        # A copy without the support vectors whose |dual coefficient| sums to at most tolerance
+        if self.kernel != "rbf":
+            raise ValueError("Only RBF models have support vectors to prune")
+        order = np.argsort(np.abs(self.dual_coef), kind="stable")
+        removed = np.cumsum(np.abs(self.dual_coef[order].astype(np.float64)))
+        dropped = int(np.searchsorted(removed, tolerance, side="right"))
+        dropped = min(dropped, len(order) - 1)  # keep at least one support vector
+        keep = np.sort(order[dropped:])
+        error = float(removed[dropped - 1]) if dropped else 0.0
+
+        meta = dict(self.meta, n_support=len(keep), max_decision_error=self.max_decision_error + error)
+        arrays = {"weights": self.weights, "intercept": self.intercept, "classes": self.classes,
+                  "support": np.ascontiguousarray(self.support[keep]),
+                  "dual_coef": np.ascontiguousarray(self.dual_coef[keep])}
+        if self.columns is not None:
+            arrays["columns"] = self.columns
+        return CompiledSVM(arrays, meta)
+
+def is_current(path=ARTIFACT_PATH, *sources):
+    # True when the artifact exists and is not older than any of the source files
+    if not os.path.exists(path):
+        return False
+    mtime = os.path.getmtime(path)
+    return all(mtime >= os.path.getmtime(source) for source in sources if os.path.exists(source))
+
+def _scaling(scaler, columns):
+    # (column indices or None, scale, offset) of a MinMaxScaler, optionally behind a FeatureSubset
+    from sklearn.preprocessing import MinMaxScaler
+    from .feature_subset import FeatureSubset
+    steps = [step for _, step in scaler.steps] if hasattr(scaler, "steps") else [scaler]
+    indices = None
+    scale = offset = None
+    for step in steps:
+        if isinstance(step, FeatureSubset):
+            if step.columns is not None:
+                indices = np.array([columns.index(column) for column in step.columns], dtype=np.int32)
+        elif isinstance(step, MinMaxScaler) and scale is None:
+            scale, offset = step.scale_, step.min_
+        else:
+            raise ValueError(f"Cannot fold {type(step).__name__} into the artifact")
+    if scale is None:
+        raise ValueError("No MinMaxScaler found in the scaler")
+    return indices, np.asarray(scale, dtype=np.float64), np.asarray(offset, dtype=np.float64)
+
+def compile_model(model, scaler):
+    # CompiledSVM equivalent to model.predict(scaler.transform(features))
+    import sklearn
+    from feature_extraction.Feature_Extractor import feature_header
+    columns = feature_header()[1:-1]
+    if len(model.classes_) != 2:
+        raise ValueError("Only binary classifiers can be compiled")
+    indices, scale, offset = _scaling(scaler, columns)
+    meta = {"version": ARTIFACT_VERSION, "kernel": model.kernel, "n_features": len(columns),
+            "max_decision_error": 0.0, "sklearn": sklearn.__version__, "created": time.time()}
+    arrays = {"classes": model.classes_, "intercept": float(model.intercept_[0])}
+    if indices is not None:
+        arrays["columns"] = indices
+
+    if model.kernel == "linear":
+        coef = np.asarray(model.coef_, dtype=np.float64).ravel()
+        arrays["weights"] = (scale * coef).astype(np.float32)
+        arrays["intercept"] += float(offset @ coef)
+    elif model.kernel == "rbf":
+        root_gamma = np.sqrt(model._gamma)  # gamma="scale" is resolved to a number at fit time
+        arrays["weights"] = (root_gamma * scale).astype(np.float32)
+        arrays["support"] = np.ascontiguousarray(root_gamma * (model.support_vectors_ - offset), dtype=np.float32)
+        arrays["dual_coef"] = np.ascontiguousarray(model.dual_coef_[0], dtype=np.float32)
+        meta["n_support"] = len(arrays["support"])
+    else:
+        raise ValueError(f"Cannot compile an SVC with kernel={model.kernel!r}")
+    return CompiledSVM(arrays, meta)
+
+def verify_artifact(compiled, model, scaler, features):
+    # Compare against sklearn on the given rows; ok when every difference is within the stated bound
+    import pandas as pd
+    from feature_extraction.Feature_Extractor import feature_header
+    features = np.asarray(features, dtype=np.float64)
+    frame = pd.DataFrame(features, columns=feature_header()[1:-1])
+    reference = model.decision_function(scaler.transform(frame))
+    decision = compiled.decision_function(features)
+    tolerance = compiled.max_decision_error + compiled.float_tolerance()
+    difference = np.abs(decision - reference)
+    flipped = (decision > 0) != (reference > 0)
+    return {
+        "rows": len(features),
+        "max_abs_decision_diff": float(difference.max()) if len(features) else 0.0,
+        "tolerance": tolerance,
+        "label_mismatches": int(flipped.sum()),
+        # A flip is only acceptable for a row within the tolerance of the boundary
+        "ok": bool(np.all(difference <= tolerance) and np.all(np.abs(reference[flipped]) <= tolerance)),
+    }
+
+def export_artifact(model, scaler, path=ARTIFACT_PATH, features=None, prune_tolerance=None):
+    # Compile, optionally prune, check against sklearn on features and write; returns the report
+    compiled = compile_model(model, scaler)
+    if prune_tolerance:
+        compiled = compiled.prune(prune_tolerance)
+    report = verify_artifact(compiled, model, scaler, features) if features is not None else None
+    if report is not None and not report["ok"]:
+        raise ValueError(f"Artifact disagrees with sklearn: {report}")
+    compiled.save(path)
+    logger.info("Wrote %s (%s kernel, %s support vectors)", path, compiled.kernel, compiled.meta.get("n_support", "no"))
+    return report
+
+def main():
+    import joblib
+    from feature_extraction.Extraction_Metrics import configure_logging
+    from .classifier import load_feature_data
+    from .inference_service import MODEL_PATH, SCALER_PATH
+
+    parser = argparse.ArgumentParser(description="Export the SVM and scaler as a float32 inference artifact")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--scaler", default=SCALER_PATH)
+    parser.add_argument("--output", default=ARTIFACT_PATH)
+    parser.add_argument("--prune-tolerance", type=float, default=None,
+                        help="drop support vectors while the decision value can move by at most this much")
+    args = parser.parse_args()
+    configure_logging()
+
+    data = load_feature_data()
+    features = data.drop(["fileName", "Label"], axis=1).to_numpy()
+    try:
+        report = export_artifact(joblib.load(args.model), joblib.load(args.scaler), args.output,
+                                 features=features, prune_tolerance=args.prune_tolerance)
+    except ValueError as e:
+        logger.error("%s", e)
+        return 1
+    print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# Shared Audio Buffer
+# Decodes a file once and hands the same samples to every extractor
+
+# Before this module each extractor called librosa.load itself, so every
+# file was decoded four times and resampled three times. The buffer decodes
+# at the native rate once, resamples to the target rate (librosa.load's
+# 22050 Hz default) once on first use, and caches the STFT that every
+# spectral feature shares.
+#
+# Uncompressed WAVs are not decoded at all: load_audio memory-maps them
+# (Wav_Reader) and the float32 samples are only converted on first use.
+# Everything else still goes through librosa.load.
+
+import librosa
+import numpy as np
+
+from .Extraction_Metrics import stage
+from .Wav_Reader import open_wav
+
+TARGET_SR = 22050
+
+class AudioBuffer:
+    def __init__(self, native_samples, native_rate, path=None, target_rate=TARGET_SR, metrics=None, source=None):
+        # Pass native_samples=None with a Wav_Reader.WavFile source to convert lazily
+        self.path = path
+        self.metrics = metrics  # Optional Extraction_Metrics.Metrics for stage timings
+        self.source = source
+        self._native_samples = native_samples
+        self.native_rate = native_rate
+        self.target_rate = target_rate
+        self._samples = None
+        self._magnitudes = {}
+
+    @property
+    def native_samples(self):
+        if self._native_samples is None:
+            with stage(self.metrics, "decode"):
+                self._native_samples = self.source.to_float32()
+        return self._native_samples
+
+    @property
+    def samples(self):
+        # Samples at the target rate, the same array librosa.load(path) returns
+        if self._samples is None:
+            if self.native_rate == self.target_rate:
+                self._samples = self.native_samples
+            else:
+                with stage(self.metrics, "resample"):
+                    self._samples = librosa.resample(self.native_samples, orig_sr=self.native_rate, target_sr=self.target_rate)
+        return self._samples
+
+    @property
+    def sampling_rate(self):
+        return self.target_rate
+
+    def magnitude(self, n_fft, hop_length):
+        # |STFT| of the target-rate samples, computed once per (n_fft, hop_length)
+        key = (n_fft, hop_length)
+        if key not in self._magnitudes:
+            samples = self.samples
+            with stage(self.metrics, "stft"):
+                self._magnitudes[key] = np.abs(librosa.stft(samples, n_fft=n_fft, hop_length=hop_length))
+        return self._magnitudes[key]
+
+def load_audio(file_path, target_rate=TARGET_SR, metrics=None):
+    wav = open_wav(file_path)
+    if wav is not None:
+        return AudioBuffer(None, wav.rate, path=file_path, target_rate=target_rate, metrics=metrics, source=wav)
+    with stage(metrics, "decode"):
+        samples, sampling_rate = librosa.load(file_path, sr=None)
+    return AudioBuffer(samples, sampling_rate, path=file_path, target_rate=target_rate, metrics=metrics)
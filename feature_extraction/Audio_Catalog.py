@@ -0,0 +1,127 @@
+# Audio Catalog
+# One folder walk and a header-only read per file, cached in a persistent index
+
+# The GUIs, generate_file_list and batch prediction used to walk folders on
+# their own, and the player decoded the whole file every second just to
+# read its length. The catalog walks a folder once (in os.walk order, so
+# row order and the train/test split stay the same). For each .wav it reads
+# only the RIFF header (Wav_Reader.read_header) to get the sample rate,
+# channels, bit depth, frame count and duration. Entries are stored in a
+# JSON index keyed by absolute path. A later scan re-reads a header only
+# when the file's size or mtime changed, and drops entries for files that
+# are gone, so reopening a large library touches nothing but stat().
+
+import json
+import logging
+import os
+import struct
+import threading
+from collections import namedtuple
+
+from .Wav_Reader import UnsupportedWav, read_header
+
+DEFAULT_CATALOG_PATH = 'feature_extraction/.audio_catalog.json'
+CATALOG_VERSION = 1
+AUDIO_EXTENSIONS = ('.wav',)
+
+logger = logging.getLogger(__name__)
+
+# rate, channels, bits, frames and duration are None when the header could not be read
+AudioInfo = namedtuple('AudioInfo', ['path', 'name', 'size', 'mtime_ns', 'rate', 'channels', 'bits', 'frames', 'duration'])
+
+def read_info(path, stat=None):
+    stat = stat or os.stat(path)
+    try:
+        _, channels, rate, bits, _, data_bytes = read_header(path)
+        frames = data_bytes // max(1, channels * bits // 8)
+        duration = frames / rate if rate else None
+    except (UnsupportedWav, struct.error, OSError, ValueError) as e:
+        logger.debug("No WAV header in %s: %s", path, e)
+        rate = channels = bits = frames = duration = None
+    return AudioInfo(path, os.path.basename(path), stat.st_size, stat.st_mtime_ns, rate, channels, bits, frames, duration)
+
+class AudioCatalog:
+    def __init__(self, index_path=DEFAULT_CATALOG_PATH):
+        self.index_path = index_path
+        self._entries = None  # absolute path -> AudioInfo
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = {}
+        if self.index_path and os.path.exists(self.index_path):
+            try:
+                with open(self.index_path) as f:
+                    index = json.load(f)
+                if index.get("version") == CATALOG_VERSION:
+                    self._entries = {path: AudioInfo(path, *fields) for path, fields in index["files"].items()}
+            except (OSError, ValueError, TypeError) as e:
+                logger.warning("Ignoring unreadable audio catalog %s: %s", self.index_path, e)
+
+    def save(self):
+        with self._lock:
+            if not self._dirty or not self.index_path:
+                return
+            index = {"version": CATALOG_VERSION,
+                     "files": {path: list(info[1:]) for path, info in self._entries.items()}}
+            directory = os.path.dirname(self.index_path)
+            try:
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                tmp_path = self.index_path + '.tmp'
+                with open(tmp_path, 'w') as f:
+                    json.dump(index, f)
+                os.replace(tmp_path, self.index_path)
+                self._dirty = False
+            except OSError as e:
+                # A read-only checkout still works, it just re-reads headers next time
+                logger.warning("Could not save the audio catalog to %s: %s", self.index_path, e)
+
+    def _refresh(self, path, stat):
+        key = os.path.abspath(path)
+        cached = self._entries.get(key)
+        if cached is not None and cached.size == stat.st_size and cached.mtime_ns == stat.st_mtime_ns:
+            return cached._replace(path=path)
+        info = read_info(path, stat)
+        self._entries[key] = info._replace(path=key)
+        self._dirty = True
+        return info
+
+    def scan(self, folder, extensions=AUDIO_EXTENSIONS):
+        # AudioInfo for every matching file under folder, in os.walk order.
+        # Paths are joined onto folder as given, like generate_file_list did.
+        with self._lock:
+            self._load()
+            found = []
+            for root, dirs, files in os.walk(folder):
+                for file in files:
+                    if file.lower().endswith(extensions):
+                        path = os.path.join(root, file)
+                        try:
+                            found.append(self._refresh(path, os.stat(path)))
+                        except OSError:
+                            continue  # removed while walking
+
+            # Forget files under this folder that no longer exist
+            prefix = os.path.join(os.path.abspath(folder), '')
+            seen = {os.path.abspath(info.path) for info in found}
+            stale = [path for path in self._entries if path.startswith(prefix) and path not in seen]
+            for path in stale:
+                del self._entries[path]
+            self._dirty = self._dirty or bool(stale)
+        self.save()
+        return found
+
+    def info(self, path):
+        # Header metadata for one file, from the index when it is current
+        with self._lock:
+            self._load()
+            info = self._refresh(path, os.stat(path))
+        return info
+
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return len(self._entries)
@@ -0,0 +1,318 @@
+# Audio Fingerprint
+# Spectral-peak hashes in a NumPy inverted index, to find re-encoded and trimmed copies
+
+# A fingerprint is a set of landmark hashes. Peaks are picked from a log
+# |STFT| of the target-rate samples (N_FFT/HOP, half the FFT size the
+# features use, so it costs about a third of an extraction), keeping the
+# strongest PEAKS_PER_SECOND local maxima below MAX_BIN (about 5.5 kHz,
+# which survives most lossy encoders). Each peak is paired with the next
+# FAN_OUT peaks less than 64 frames later, giving the hash (f1, f2, dt) in
+# 22 bits, stored with the anchor's frame number. Re-encoding, resampling
+# and gain changes move few peaks, and trimming only shifts every frame
+# number by the same amount. The hop has to stay below the FFT size: with
+# no overlap, a trim that is not a whole number of hops moves too many peaks.
+#
+# The index keeps (hash, file id, frame) triples in sorted NumPy arrays. A
+# query finds every stored occurrence of its hashes with searchsorted, so
+# it costs O(q log n + matches) rather than a scan over all files. A copy is
+# recognised by many hashes agreeing on one time offset (frame in the index
+# minus frame in the query; neighbouring offsets are pooled for frame
+# jitter). New files go into small sorted segments that are merged
+# geometrically, so adding n files one at a time costs O(n log^2 n).
+#
+# Every file gets a group: its own id, or the group of the file it
+# duplicates. generate_rows uses the groups to extract one file per group
+# and reuse (or skip) the features for the copies. The classifier uses
+# them to keep all copies of a clip on the same side of the train/test
+# split. The index is saved as one .npz and, like the AudioCatalog, only
+# files whose size or mtime changed are fingerprinted again.
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .Audio_Buffer import load_audio
+
+DEFAULT_INDEX_PATH = 'feature_extraction/.fingerprints.npz'
+INDEX_VERSION = 1
+
+N_FFT = 1024
+HOP = 512
+MAX_BIN = 256            # f1 and f2 take 8 bits each
+MAX_DT = 63              # dt takes 6 bits
+FAN_OUT = 5
+PEAKS_PER_SECOND = 30
+PEAK_NEIGHBORHOOD = (9, 7)  # bins x frames around each local maximum
+
+# A match needs MIN_MATCHES hashes at one offset, making up at least
+# MIN_RATIO of the smaller fingerprint's hashes
+MIN_MATCHES = 12
+MIN_RATIO = 0.1
+
+logger = logging.getLogger(__name__)
+
+def fingerprint(buffer):
+    # (hashes uint32, anchor frames int32) of an AudioBuffer
+    from scipy.ndimage import maximum_filter
+    spectrum = np.log(buffer.magnitude(N_FFT, HOP)[1:MAX_BIN] + 1e-6)
+    peaks = (spectrum == maximum_filter(spectrum, size=PEAK_NEIGHBORHOOD)) & (spectrum > spectrum.mean())
+    bins, frames = np.nonzero(peaks)
+    bins += 1  # row 0 of spectrum is bin 1
+
+    # Keep the strongest peaks, then put them back in time order
+    limit = max(1, int(PEAKS_PER_SECOND * spectrum.shape[1] * HOP / buffer.sampling_rate))
+    if len(frames) > limit:
+        strongest = np.argpartition(spectrum[bins - 1, frames], -limit)[-limit:]
+        bins, frames = bins[strongest], frames[strongest]
+    order = np.lexsort((bins, frames))
+    bins, frames = bins[order], frames[order]
+
+    hashes = []
+    anchors = []
+    for k in range(1, FAN_OUT + 1):
+        dt = frames[k:] - frames[:-k]
+        valid = (dt >= 1) & (dt <= MAX_DT)
+        f1 = bins[:-k][valid].astype(np.uint32)
+        f2 = bins[k:][valid].astype(np.uint32)
+        hashes.append((f1 << 14) | (f2 << 6) | dt[valid].astype(np.uint32))
+        anchors.append(frames[:-k][valid].astype(np.int32))
+    if not hashes:
+        return np.empty(0, np.uint32), np.empty(0, np.int32)
+    return np.concatenate(hashes), np.concatenate(anchors)
+
+def fingerprint_file(path):
+    # Runs in a worker process: (hashes, frames, error)
+    try:
+        return fingerprint(load_audio(path)) + (None,)
+    except Exception as e:
+        return None, None, f"{type(e).__name__}: {e}"
+
+def _sorted_segment(hashes, file_ids, frames):
+    order = np.argsort(hashes, kind='stable')
+    return hashes[order], file_ids[order], frames[order]
+
+def _merge(a, b):
+    return _sorted_segment(*(np.concatenate((x, y)) for x, y in zip(a, b)))
+
+class FingerprintIndex:
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self.paths = []          # file id -> absolute path
+        self.stats = []          # file id -> (size, mtime_ns)
+        self.counts = []         # file id -> number of hashes
+        self.groups = []         # file id -> group (a file id)
+        self.alive = []          # False once a file is re-fingerprinted or removed
+        self._ids = {}           # absolute path -> live file id
+        self._segments = []      # sorted (hashes, file ids, frames), largest first
+        self._dirty = False
+        if path and os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if int(data["version"]) != INDEX_VERSION:
+                    return
+                self.paths = data["paths"].tolist()
+                self.stats = [tuple(stat) for stat in data["stats"].tolist()]
+                self.counts = data["counts"].tolist()
+                self.groups = data["groups"].tolist()
+                self.alive = [True] * len(self.paths)
+                self._ids = {path: file_id for file_id, path in enumerate(self.paths)}
+                if len(data["hashes"]):
+                    self._segments = [(data["hashes"], data["file_ids"], data["frames"])]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Ignoring unreadable fingerprint index %s: %s", self.path, e)
+
+    def save(self):
+        if not self._dirty or not self.path:
+            return
+        # Drop stale files and renumber so the saved index only holds live entries
+        live = [file_id for file_id, alive in enumerate(self.alive) if alive]
+        renumber = np.full(len(self.paths), -1, dtype=np.int32)
+        renumber[live] = np.arange(len(live), dtype=np.int32)
+        hashes, file_ids, frames = self._compacted()
+        keep = renumber[file_ids] >= 0
+        groups = [int(renumber[self.groups[file_id]]) for file_id in live]
+        groups = [group if group >= 0 else new_id for new_id, group in enumerate(groups)]
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, version=INDEX_VERSION,
+                     paths=np.array([self.paths[file_id] for file_id in live], dtype=str),
+                     stats=np.array([self.stats[file_id] for file_id in live], dtype=np.int64).reshape(-1, 2),
+                     counts=np.array([self.counts[file_id] for file_id in live], dtype=np.int64),
+                     groups=np.array(groups, dtype=np.int64),
+                     hashes=hashes[keep], file_ids=renumber[file_ids[keep]], frames=frames[keep])
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def _compacted(self):
+        while len(self._segments) > 1:
+            self._segments.append(_merge(self._segments.pop(), self._segments.pop()))
+        if self._segments:
+            return self._segments[0]
+        return np.empty(0, np.uint32), np.empty(0, np.int32), np.empty(0, np.int32)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, path):
+        return self.lookup(path) is not None
+
+    def lookup(self, path):
+        # Live file id when path is indexed and unchanged, otherwise None
+        file_id = self._ids.get(os.path.abspath(path))
+        if file_id is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None  # indexed, then deleted or made unreadable
+        return file_id if self.stats[file_id] == (stat.st_size, stat.st_mtime_ns) else None
+
+    def match(self, hashes, frames):
+        # (file id, matching hashes) of the best near-duplicate, or (None, 0)
+        if not len(hashes) or not self._segments:
+            return None, 0
+        candidates = []
+        offsets = []
+        for segment_hashes, segment_ids, segment_frames in self._segments:
+            lo = np.searchsorted(segment_hashes, hashes, side='left')
+            hi = np.searchsorted(segment_hashes, hashes, side='right')
+            counts = hi - lo
+            total = int(counts.sum())
+            if not total:
+                continue
+            # Positions lo[i] .. hi[i]-1 for every query hash i, flattened
+            starts = np.repeat(lo - np.cumsum(counts) + counts, counts)
+            positions = starts + np.arange(total)
+            candidates.append(segment_ids[positions])
+            offsets.append(segment_frames[positions] - np.repeat(frames, counts))
+        if not candidates:
+            return None, 0
+        candidates = np.concatenate(candidates).astype(np.int64)
+        offsets = np.concatenate(offsets).astype(np.int64)
+        matched, inverse = np.unique(candidates, return_inverse=True)
+        alive = np.array([self.alive[file_id] for file_id in matched])[inverse]
+        candidates, offsets = candidates[alive], offsets[alive]
+        if not len(candidates):
+            return None, 0
+
+        # Votes per (file, offset); pooling offset and offset + 1 absorbs one frame of jitter
+        span = 2 * (offsets.max() - offsets.min() + 2)
+        keys = candidates * span + (offsets - offsets.min())
+        keys, votes = np.unique(keys, return_counts=True)
+        next_votes = np.zeros_like(votes)
+        neighbour = np.searchsorted(keys, keys + 1)
+        found = neighbour < len(keys)
+        found[found] = keys[neighbour[found]] == keys[found] + 1
+        next_votes[found] = votes[neighbour[found]]
+        scores = votes + next_votes
+        best = int(np.argmax(scores))
+        file_id, score = int(keys[best] // span), int(scores[best])
+        if score < MIN_MATCHES or score < MIN_RATIO * min(len(hashes), self.counts[file_id]):
+            return None, 0
+        return file_id, score
+
+    def add(self, path, hashes, frames, group=None):
+        # Index a file; group is the id of the file it duplicates, if any
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        previous = self._ids.get(key)
+        if previous is not None:
+            self.alive[previous] = False
+        file_id = len(self.paths)
+        self.paths.append(key)
+        self.stats.append((stat.st_size, stat.st_mtime_ns))
+        self.counts.append(len(hashes))
+        self.groups.append(file_id if group is None else self.groups[group])
+        self.alive.append(True)
+        self._ids[key] = file_id
+        self._dirty = True
+        if len(hashes):
+            self._segments.append(_sorted_segment(np.asarray(hashes, np.uint32),
+                                                  np.full(len(hashes), file_id, np.int32),
+                                                  np.asarray(frames, np.int32)))
+            # Merge while the newest segment is at least half the size of the one before it
+            while len(self._segments) > 1 and 2 * len(self._segments[-1][0]) >= len(self._segments[-2][0]):
+                self._segments.append(_merge(self._segments.pop(), self._segments.pop()))
+        return file_id
+
+    def canonical(self, path):
+        # The path that stands for path's duplicate group (path itself when unique or unknown)
+        file_id = self._ids.get(os.path.abspath(path))
+        if file_id is None:
+            return path
+        group = self.groups[file_id]
+        return self.paths[group] if self.alive[group] else path
+
+    def name_groups(self, names):
+        # A group key per file name (basename, as in the feature table): the canonical
+        # file's name, which stays the same across runs. Unknown names are their own group.
+        by_name = {os.path.basename(path): os.path.basename(self.canonical(path)) for path in self._ids}
+        return [by_name.get(name, name) for name in names]
+
+def duplicate_groups(names, index_path=DEFAULT_INDEX_PATH):
+    # Group keys for names when the saved index knows of duplicates among them, otherwise None
+    if not index_path or not os.path.exists(index_path):
+        return None
+    groups = FingerprintIndex(index_path).name_groups(names)
+    return groups if len(set(groups)) < len(groups) else None
+
+def find_duplicates(files, index, workers=1, chunk_size=4, progress=None, cancel=None):
+    # path -> canonical path for every file, fingerprinting only new or changed files.
+    # Files are matched in list order, so the first copy of a clip is the canonical one.
+    # progress(done, total, path, ok) is called as each new file is fingerprinted; when
+    # cancel is set, the files fingerprinted so far are saved and ExtractionCancelled is raised.
+    if workers is None:
+        workers = os.cpu_count() or 1
+    new = [path for path in files if index.lookup(path) is None]
+    try:
+        if workers <= 1 or len(new) <= 1:
+            results = map(fingerprint_file, new)
+            canonical = _index_new(files, new, results, index, progress, cancel)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(fingerprint_file, new, chunksize=max(1, chunk_size))
+                try:
+                    canonical = _index_new(files, new, results, index, progress, cancel)
+                except BaseException:
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    raise
+    finally:
+        index.save()
+    return canonical
+
+def _index_new(files, new, results, index, progress=None, cancel=None):
+    new_set = set(new)
+    results = iter(results)
+    spelled = {os.path.abspath(path): path for path in files}  # the index stores absolute paths
+    canonical = {}
+    done = 0
+    for path in files:
+        if path in new_set:
+            hashes, frames, error = next(results)
+            if error is None:
+                match, score = index.match(hashes, frames)
+                if match is not None:
+                    logger.info("%s duplicates %s (%d matching hashes)", path, index.paths[match], score)
+                try:
+                    index.add(path, hashes, frames, group=match)
+                except OSError as e:  # removed after it was fingerprinted
+                    error = f"{type(e).__name__}: {e}"
+            done += 1
+            if progress is not None:
+                progress(done, len(new), path, error is None)
+            if cancel is not None and cancel.is_set():
+                from .Feature_Extractor import ExtractionCancelled
+                logger.info("Fingerprinting cancelled after %d of %d files.", done, len(new))
+                raise ExtractionCancelled()
+            if error is not None:
+                logger.warning("Could not fingerprint %s: %s", path, error)
+                canonical[path] = path
+                continue
+        original = index.canonical(path)
+        canonical[path] = spelled.get(os.path.abspath(original), original)
+    return canonical
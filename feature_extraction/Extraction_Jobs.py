@@ -0,0 +1,399 @@
+# Extraction Jobs
+# Resumable, sharded feature extraction driven by a manifest in a shared directory
+
+# generate_csv keeps every row in memory and writes features.csv once at the
+# end, so a crash loses the whole run and one machine does all the work.
+# A job splits the same work into shards that any number of processes or
+# machines can run against one shared directory:
+#   manifest.json        the frozen file list (in generate_file_list order),
+#                        the shard count and the extractor_params() the job
+#                        was created with
+#   shards/NNNNN.csv     path + feature columns of every finished file,
+#                        appended and fsync'ed every checkpoint_every files
+#   shards/NNNNN.failed  one JSON line per file that failed
+#   shards/NNNNN.done    written once every file of the shard has been extracted
+#   shards/NNNNN.lock    held by the process working on the shard
+# File i of the manifest belongs to shard i % n_shards, so shards stay
+# deterministic and evenly sized. A rerun reads the shard CSV back, drops a
+# torn last line and skips every file already in it; failed files are
+# retried, so a shard with failures is never marked done. Shards are claimed
+# with O_CREAT | O_EXCL lock files holding a random token. A lock whose mtime
+# has not moved for stale_after seconds (the holder touches it from a timer
+# thread) is taken over, so a crashed node's shard is picked up again. The
+# holder checks its token before every checkpoint and stops if it lost the lock.
+# merge_job puts the rows back in manifest order and writes features.csv and
+# the feature store exactly as generate_csv does.
+#
+# Paths in the manifest are used as listed, so every node must run from the
+# same directory layout (e.g. the repository root on a shared mount).
+#
+# Use the following commands to run:
+#   $python -m feature_extraction.Extraction_Jobs create jobs/full audio/ --shards 16
+#   $python -m feature_extraction.Extraction_Jobs run jobs/full --workers 8      (on every node)
+#   $python -m feature_extraction.Extraction_Jobs run jobs/full --shard 3
+#   $python -m feature_extraction.Extraction_Jobs status jobs/full
+#   $python -m feature_extraction.Extraction_Jobs merge jobs/full
+
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+
+from .Extraction_Metrics import Metrics, configure_logging
+from .Feature_Cache import FeatureCache, extractor_params
+from .Feature_Extractor import (DEFAULT_CHUNK_SIZE, FEATURES_CSV, feature_header, generate_file_list,
+                                generate_rows, make_row, save_rows)
+from .Feature_Store import DEFAULT_STORE_PATH
+
+MANIFEST_NAME = 'manifest.json'
+JOB_VERSION = 1
+DEFAULT_CHECKPOINT_EVERY = 64
+DEFAULT_STALE_AFTER = 300.0
+
+logger = logging.getLogger(__name__)
+
+class JobError(Exception):
+    pass
+
+class ShardLocked(JobError):
+    pass
+
+class LockLost(JobError):
+    pass
+
+def _write_json(path, value):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(value, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def create_job(job_dir, dir_path=None, n_shards=1, files=None, catalog=None):
+    # Write the manifest; files (already listed paths) skips the folder walk
+    if n_shards < 1:
+        raise ValueError("n_shards must be at least 1")
+    manifest_path = os.path.join(job_dir, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        raise JobError(f"{manifest_path} already exists; use a new job directory")
+    if files is None:
+        files = generate_file_list(dir_path, catalog)
+    manifest = {
+        "version": JOB_VERSION,
+        "created": time.time(),
+        "source": dir_path,
+        "n_shards": n_shards,
+        "params": extractor_params(),
+        "columns": feature_header()[1:-1],
+        "files": list(files),
+    }
+    os.makedirs(os.path.join(job_dir, 'shards'), exist_ok=True)
+    _write_json(manifest_path, manifest)
+    logger.info("Created job %s: %d files in %d shards", job_dir, len(files), n_shards)
+    return manifest
+
+def load_manifest(job_dir):
+    with open(os.path.join(job_dir, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != JOB_VERSION:
+        raise JobError(f"{job_dir} was created by an incompatible version of Extraction_Jobs")
+    return manifest
+
+def shard_files(manifest, shard):
+    return manifest["files"][shard::manifest["n_shards"]]
+
+def _shard_path(job_dir, shard, suffix):
+    return os.path.join(job_dir, 'shards', f"{shard:05d}{suffix}")
+
+def read_shard(job_dir, shard, columns, repair=False):
+    # path -> features for every row checkpointed by the shard so far. A torn
+    # last line (a crash or an append in progress) is ignored; with repair=True,
+    # which only the lock holder may use, it is also cut off so appends start clean.
+    path = _shard_path(job_dir, shard, '.csv')
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'rb+' if repair else 'rb') as f:
+        content = f.read()
+        end = content.rfind(b'\n') + 1
+        if repair and end < len(content):
+            logger.warning("Dropping a partial row at the end of %s", path)
+            f.truncate(end)
+    rows = {}
+    reader = csv.reader(content[:end].decode('utf-8').splitlines())
+    header = next(reader, None)
+    if header is not None and header != ["path"] + columns:
+        raise JobError(f"{path} has columns {header[1:]}, expected {columns}")
+    for row in reader:
+        rows[row[0]] = [float(value) for value in row[1:]]
+    return rows
+
+def _append(path, lines, header=None):
+    # Append whole lines and make them durable before reporting progress
+    with open(path, 'a', newline='') as f:
+        if header is not None and f.tell() == 0:
+            f.write(header)
+        f.write(''.join(lines))
+        f.flush()
+        os.fsync(f.fileno())
+
+def _csv_line(values):
+    line = io.StringIO()
+    csv.writer(line, lineterminator='\n').writerow(values)
+    return line.getvalue()
+
+class ShardLock:
+    # An O_EXCL lock file holding a random token. The holder re-reads the token
+    # before every heartbeat, checkpoint and release, so a process whose lock
+    # was taken over stops instead of writing next to the new owner.
+    def __init__(self, path, token, stale_after=DEFAULT_STALE_AFTER):
+        self.path = path
+        self.token = token
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        # A timer heartbeat keeps a slow shard from looking stale between checkpoints
+        self._heartbeat = threading.Thread(target=self._beat, args=(stale_after / 5,), daemon=True)
+        self._heartbeat.start()
+
+    def held(self):
+        return not self.lost.is_set() and _lock_token(self.path) == self.token
+
+    def _beat(self, interval):
+        while not self._stop.wait(interval):
+            if not self.held():
+                self.lost.set()
+                return
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                self.lost.set()
+                return
+
+    def check(self):
+        if not self.held():
+            self.lost.set()
+            raise LockLost(f"lost the lock {self.path} to another process")
+
+    def release(self):
+        self._stop.set()
+        if self.held():
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+def acquire_lock(job_dir, shard, stale_after=DEFAULT_STALE_AFTER):
+    lock_path = _shard_path(job_dir, shard, '.lock')
+    token = uuid.uuid4().hex
+    owner = json.dumps({"host": socket.gethostname(), "pid": os.getpid(), "started": time.time(), "token": token})
+    for _ in range(2):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            stale_token = _lock_token(lock_path)
+            try:
+                age = time.time() - os.path.getmtime(lock_path)
+            except FileNotFoundError:
+                continue  # released between the two calls
+            if age < stale_after:
+                raise ShardLocked(f"shard {shard} is locked by {_lock_owner(lock_path)}")
+            # Move the stale lock aside, then make sure it is the one we judged stale:
+            # another node may have replaced it with a fresh lock in the meantime.
+            stale_path = f"{lock_path}.stale.{token}"
+            try:
+                os.rename(lock_path, stale_path)
+            except FileNotFoundError:
+                raise ShardLocked(f"shard {shard} was taken over by another process")
+            if _lock_token(stale_path) != stale_token:
+                try:
+                    os.link(stale_path, lock_path)  # put the fresh lock back unless yet another one exists
+                except OSError:
+                    pass
+                os.remove(stale_path)
+                raise ShardLocked(f"shard {shard} was taken over by another process")
+            os.remove(stale_path)
+            logger.warning("Taking over shard %d: its lock was last touched %.0f s ago", shard, age)
+            continue
+        with os.fdopen(fd, 'w') as f:
+            f.write(owner)
+            f.flush()
+            os.fsync(f.fileno())
+        return ShardLock(lock_path, token, stale_after)
+    raise ShardLocked(f"shard {shard} is locked")
+
+def _lock_owner(lock_path):
+    try:
+        with open(lock_path) as f:
+            return f.read().strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+def _lock_token(lock_path):
+    # The token in a lock file, or None when it is missing or not fully written
+    try:
+        with open(lock_path) as f:
+            return json.load(f).get("token")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def run_shard(job_dir, shard, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, checkpoint_every=DEFAULT_CHECKPOINT_EVERY,
+              cache=None, streaming=False, metrics=None, stale_after=DEFAULT_STALE_AFTER, manifest=None):
+    # Extract the files of one shard that are not checkpointed yet.
+    # Returns (files done, files failed in this run).
+    manifest = manifest or load_manifest(job_dir)
+    if manifest["params"] != extractor_params():
+        raise JobError(f"{job_dir} was created with extractor parameters {manifest['params']}, "
+                       f"these extractors use {extractor_params()}")
+    if not 0 <= shard < manifest["n_shards"]:
+        raise ValueError(f"shard must be in [0, {manifest['n_shards']})")
+
+    columns = manifest["columns"]
+    files = shard_files(manifest, shard)
+    rows_path = _shard_path(job_dir, shard, '.csv')
+    lock = acquire_lock(job_dir, shard, stale_after)
+    try:
+        done = read_shard(job_dir, shard, columns, repair=True)
+        pending = [path for path in files if path not in done]
+        logger.info("Shard %d: %d of %d files already done, %d to extract",
+                    shard, len(files) - len(pending), len(files), len(pending))
+        header = _csv_line(["path"] + columns)
+        failed = 0
+        for start in range(0, len(pending), max(1, checkpoint_every)):
+            batch = pending[start:start + checkpoint_every]
+            data, failures = generate_rows(batch, workers=workers, chunk_size=chunk_size, cache=cache,
+                                           streaming=streaming, metrics=metrics)
+            lock.check()  # never append after another node has taken the shard over
+            failed_paths = {path for path, _ in failures}
+            extracted = [path for path in batch if path not in failed_paths]
+            # data rows are [fileName, features..., Label] in batch order. The repr of a
+            # float64 round-trips exactly, so merged rows equal the in-memory ones.
+            lines = [_csv_line([path] + [repr(float(value)) for value in row[1:-1]]) for path, row in zip(extracted, data)]
+            _append(rows_path, lines, header)
+            if failures:
+                _append(_shard_path(job_dir, shard, '.failed'),
+                        [json.dumps({"path": path, "error": error}) + '\n' for path, error in failures])
+            failed += len(failures)
+            done.update((path, None) for path in extracted)
+            logger.info("Shard %d: checkpoint at %d of %d files", shard, len(files) - len(pending) + start + len(batch), len(files))
+
+        # Files that failed keep the shard open, so the next run retries them
+        if len(done) == len(files):
+            lock.check()
+            _write_json(_shard_path(job_dir, shard, '.done'), {"files": len(files), "finished": time.time()})
+        else:
+            logger.warning("Shard %d: %d files failed; run the shard again to retry them", shard, len(files) - len(done))
+        return len(done), failed
+    finally:
+        lock.release()
+
+def run_job(job_dir, shard=None, **kwargs):
+    # Run one shard, or (shard=None) keep claiming unfinished shards until none are left.
+    # Several processes or machines can call this on the same job directory.
+    manifest = load_manifest(job_dir)
+    shards = range(manifest["n_shards"]) if shard is None else [shard]
+    ran = []
+    for index in shards:
+        if shard is None and os.path.exists(_shard_path(job_dir, index, '.done')):
+            continue
+        try:
+            run_shard(job_dir, index, manifest=manifest, **kwargs)
+        except ShardLocked as e:
+            if shard is not None:
+                raise
+            logger.info("Skipping %s", e)
+            continue
+        ran.append(index)
+    return ran
+
+def job_status(job_dir):
+    manifest = load_manifest(job_dir)
+    shards = []
+    for shard in range(manifest["n_shards"]):
+        lock_path = _shard_path(job_dir, shard, '.lock')
+        shards.append({
+            "shard": shard,
+            "files": len(shard_files(manifest, shard)),
+            "extracted": len(read_shard(job_dir, shard, manifest["columns"])),
+            "done": os.path.exists(_shard_path(job_dir, shard, '.done')),
+            "locked_by": _lock_owner(lock_path) if os.path.exists(lock_path) else None,
+        })
+    return {"files": len(manifest["files"]), "n_shards": manifest["n_shards"],
+            "extracted": sum(shard["extracted"] for shard in shards), "shards": shards}
+
+def merge_job(job_dir, output_path=FEATURES_CSV, store_path=DEFAULT_STORE_PATH, allow_partial=False):
+    # Combine the shard outputs in manifest order into features.csv and the feature store
+    manifest = load_manifest(job_dir)
+    features = {}
+    for shard in range(manifest["n_shards"]):
+        features.update(read_shard(job_dir, shard, manifest["columns"]))
+    missing = [path for path in manifest["files"] if path not in features]
+    if missing and not allow_partial:
+        raise JobError(f"{len(missing)} of {len(manifest['files'])} files have no features yet "
+                       f"(first: {missing[0]}); rerun the shards or merge with allow_partial=True")
+    if missing:
+        logger.warning("Merging without %d files that have no features", len(missing))
+    data = [make_row(path, features[path]) for path in manifest["files"] if path in features]
+    return save_rows(data, output_path, store_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumable, sharded feature extraction")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create = commands.add_parser("create", help="write the manifest of a new job")
+    create.add_argument("job_dir")
+    create.add_argument("audio_dir")
+    create.add_argument("--shards", type=int, default=1)
+
+    run = commands.add_parser("run", help="extract one shard, or claim shards until none are left")
+    run.add_argument("job_dir")
+    run.add_argument("--shard", type=int, help="run only this shard (default: claim any unfinished shard)")
+    run.add_argument("--workers", type=int, default=None, help="extraction processes (default: all CPUs)")
+    run.add_argument("--checkpoint-every", type=int, default=DEFAULT_CHECKPOINT_EVERY, help="files between checkpoints")
+    run.add_argument("--stale-after", type=float, default=DEFAULT_STALE_AFTER,
+                     help="seconds without a heartbeat after which another node may take a shard over")
+    run.add_argument("--cache", action="store_true", help="reuse features from the on-disk feature cache")
+    run.add_argument("--streaming", action="store_true", help="bounded-memory extraction for long recordings")
+    run.add_argument("--metrics", help="write per-stage extraction metrics here (.prom for Prometheus text, else JSON)")
+
+    status = commands.add_parser("status", help="print the progress of every shard as JSON")
+    status.add_argument("job_dir")
+
+    merge = commands.add_parser("merge", help="write features.csv and the feature store from the shard outputs")
+    merge.add_argument("job_dir")
+    merge.add_argument("--output", default=FEATURES_CSV)
+    merge.add_argument("--store", default=DEFAULT_STORE_PATH)
+    merge.add_argument("--allow-partial", action="store_true", help="merge even if some files have no features")
+
+    parser.add_argument("--log-level", default="INFO")
+    parser.add_argument("--log-json", action="store_true", help="log one JSON object per line")
+    args = parser.parse_args()
+    configure_logging(level=args.log_level.upper(), json_format=args.log_json)
+
+    try:
+        if args.command == "create":
+            create_job(args.job_dir, args.audio_dir, n_shards=args.shards)
+        elif args.command == "run":
+            metrics = Metrics()
+            run_job(args.job_dir, shard=args.shard, workers=args.workers, checkpoint_every=args.checkpoint_every,
+                    stale_after=args.stale_after, cache=FeatureCache() if args.cache else None,
+                    streaming=args.streaming, metrics=metrics)
+            if args.metrics:
+                with open(args.metrics, 'w') as f:
+                    f.write(metrics.to_prometheus() if args.metrics.endswith('.prom') else metrics.to_json())
+        elif args.command == "status":
+            print(json.dumps(job_status(args.job_dir), indent=2))
+        else:
+            merge_job(args.job_dir, args.output, args.store, allow_partial=args.allow_partial)
+    except JobError as e:
+        logger.error("%s", e)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
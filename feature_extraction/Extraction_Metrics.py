@@ -0,0 +1,166 @@
+# Extraction Metrics
+# Per-stage timers, counters and optional per-file profiling for the pipeline
+
+# A Metrics object is passed down the pipeline (metrics=...) and collects:
+#   - stage timers: decode, resample, stft, time_domain, spectral, mfcc, ...
+#   - counters: files_processed, files_failed, cache_hits, cache_misses, ...
+#   - optionally a cProfile dump (profile_dir) and the tracemalloc peak for
+#     every file
+# Callbacks are called as callback(event, **fields). The events are
+# "stage" (name, seconds, path) and "file" (path, seconds, ok).
+# Worker processes fill their own Metrics. The parent merges the snapshot
+# each worker returns. Dump the result with to_json() or to_prometheus().
+#
+# Logging helpers live here too. Every module logs through
+# logging.getLogger(__name__), and configure_logging picks the level and,
+# if wanted, one-JSON-object-per-line output.
+
+import cProfile
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+class Metrics:
+    def __init__(self, profile_dir=None, trace_memory=False, callbacks=None):
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        self.callbacks = list(callbacks or [])
+        self.stages = {}    # name -> {"count", "seconds", "max_seconds"}
+        self.counters = {}
+        self.memory_peaks = {}  # path -> peak traced bytes
+        self._current_path = None
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def _emit(self, event, **fields):
+        for callback in self.callbacks:
+            callback(event, **fields)
+
+    def increment(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record_stage(self, name, seconds):
+        stage = self.stages.setdefault(name, {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+        stage["count"] += 1
+        stage["seconds"] += seconds
+        stage["max_seconds"] = max(stage["max_seconds"], seconds)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.record_stage(name, seconds)
+            self._emit("stage", name=name, seconds=seconds, path=self._current_path)
+
+    @contextmanager
+    def file(self, path):
+        # Wraps one file's extraction; optional cProfile and tracemalloc capture
+        self._current_path = path
+        profiler = cProfile.Profile() if self.profile_dir else None
+        tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        if profiler:
+            profiler.enable()
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            seconds = time.perf_counter() - start
+            if profiler:
+                profiler.disable()
+                os.makedirs(self.profile_dir, exist_ok=True)
+                profiler.dump_stats(os.path.join(self.profile_dir, os.path.basename(path) + '.prof'))
+            if tracing:
+                self.memory_peaks[path] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            self.record_stage("file", seconds)
+            self.increment("files_processed" if ok else "files_failed")
+            self._current_path = None
+            self._emit("file", path=path, seconds=seconds, ok=ok)
+
+    def snapshot(self):
+        return {
+            "stages": {name: dict(stage) for name, stage in self.stages.items()},
+            "counters": dict(self.counters),
+            "memory_peaks": dict(self.memory_peaks),
+        }
+
+    def merge(self, snapshot, path=None):
+        # Fold in a snapshot taken in another process. With path, the snapshot
+        # covers one file, and its events are replayed to the callbacks.
+        if path is not None and self.callbacks:
+            for name, other in snapshot["stages"].items():
+                if name == "file":
+                    self._emit("file", path=path, seconds=other["seconds"], ok=snapshot["counters"].get("files_failed", 0) == 0)
+                else:
+                    self._emit("stage", name=name, seconds=other["seconds"], path=path)
+        for name, other in snapshot["stages"].items():
+            stage = self.stages.setdefault(name, {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+            stage["count"] += other["count"]
+            stage["seconds"] += other["seconds"]
+            stage["max_seconds"] = max(stage["max_seconds"], other["max_seconds"])
+        for name, amount in snapshot["counters"].items():
+            self.increment(name, amount)
+        self.memory_peaks.update(snapshot["memory_peaks"])
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self, prefix="audio_extraction"):
+        lines = [
+            f"# HELP {prefix}_stage_seconds_total Time spent in each pipeline stage.",
+            f"# TYPE {prefix}_stage_seconds_total counter",
+        ]
+        for name, stage in sorted(self.stages.items()):
+            lines.append(f'{prefix}_stage_seconds_total{{stage="{name}"}} {stage["seconds"]:.6f}')
+        lines.append(f"# TYPE {prefix}_stage_calls_total counter")
+        for name, stage in sorted(self.stages.items()):
+            lines.append(f'{prefix}_stage_calls_total{{stage="{name}"}} {stage["count"]}')
+        lines.append(f"# TYPE {prefix}_stage_seconds_max gauge")
+        for name, stage in sorted(self.stages.items()):
+            lines.append(f'{prefix}_stage_seconds_max{{stage="{name}"}} {stage["max_seconds"]:.6f}')
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+def stage(metrics, name):
+    # metrics.stage(name), or a no-op when no Metrics object is attached
+    return metrics.stage(name) if metrics is not None else nullcontext()
+
+class JsonFormatter(logging.Formatter):
+    # One JSON object per line: time, level, logger, message and any extra= fields
+    _reserved = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+    def format(self, record):
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        payload.update({key: value for key, value in vars(record).items() if key not in self._reserved})
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+def configure_logging(level=logging.INFO, json_format=False, stream=sys.stderr):
+    handler = logging.StreamHandler(stream)
+    if json_format:
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
@@ -0,0 +1,136 @@
+# Feature Cache
+# Persists extracted feature vectors on disk so re-runs only process new or changed files
+
+# Each entry is keyed by the file (its path, size and mtime, or a hash of its
+# content), by the extraction mode (whole-file or streaming) and by every
+# setting that changes the extracted values. Editing a file, switching mode,
+# changing FRAME_SIZE/HOP_LENGTH/N_MELS/N_MFCC/TARGET_SR, or bumping
+# FEATURE_VERSION therefore misses the cache rather than returning stale
+# features. Entries are evicted least-recently-used once the cache grows
+# past max_bytes.
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .Audio_Buffer import TARGET_SR
+from .Feature_Extraction_Spectral_Centroid import FRAME_SIZE, HOP_LENGTH
+from .Feature_Spectral import N_MELS, N_MFCC
+
+# Bump whenever an extractor changes in a way that changes its output
+FEATURE_VERSION = 3
+
+DEFAULT_CACHE_DIR = 'feature_extraction/.feature_cache'
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+def extractor_params():
+    return {
+        "version": FEATURE_VERSION,
+        "target_sr": TARGET_SR,
+        "frame_size": FRAME_SIZE,
+        "hop_length": HOP_LENGTH,
+        "n_mels": N_MELS,
+        "n_mfcc": N_MFCC,
+    }
+
+def content_hash(file_path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class FeatureCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, by_content=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.by_content = by_content
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._params = json.dumps(extractor_params(), sort_keys=True)
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, _, size in self._entries())
+
+    def key(self, file_path, streaming=False):
+        if self.by_content:
+            identity = content_hash(file_path)
+        else:
+            stat = os.stat(file_path)
+            identity = f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        mode = "streaming" if streaming else "whole"
+        return hashlib.sha256(f"{identity}|{mode}|{self._params}".encode()).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.npy')
+
+    def get(self, file_path, streaming=False):
+        # Return the cached feature vector for file_path, or None on a miss.
+        # A missing or unreadable file is a miss; extraction then reports it.
+        try:
+            entry = self._entry_path(self.key(file_path, streaming))
+            features = np.load(entry)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        os.utime(entry)  # Mark as recently used for LRU eviction
+        self.hits += 1
+        return features
+
+    def put(self, file_path, features, streaming=False):
+        try:
+            entry = self._entry_path(self.key(file_path, streaming))
+        except OSError:
+            return  # removed since it was extracted; nothing to key the entry on
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        if os.path.exists(entry):
+            self._total_bytes -= os.path.getsize(entry)
+
+        # Write then rename so a crash never leaves a truncated entry behind
+        tmp_path = entry + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.asarray(features, dtype=np.float64))
+        os.replace(tmp_path, entry)
+
+        self._total_bytes += os.path.getsize(entry)
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self, target_bytes=None):
+        # Drop least-recently-used entries until the cache fits in target_bytes
+        if target_bytes is None:
+            target_bytes = self.max_bytes
+        for _, entry, size in sorted(self._entries()):
+            if self._total_bytes <= target_bytes:
+                break
+            try:
+                os.remove(entry)
+            except OSError:
+                continue
+            self._total_bytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        self.evict(target_bytes=0)
+
+    def _entries(self):
+        # (last used, path, size) for every entry on disk
+        for root, dirs, files in os.walk(self.cache_dir):
+            for file in files:
+                if file.endswith('.npy'):
+                    entry = os.path.join(root, file)
+                    stat = os.stat(entry)
+                    yield stat.st_mtime_ns, entry, stat.st_size
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+        }
@@ -4,15 +4,15 @@
 # Class example
 # sum(amplitude1^2 + amplitude2^2 + ... amplitudeN^2) / length
 
-import librosa
+from .Audio_Buffer import load_audio
+from .Feature_Time_Domain import avg_energy
 
-def extract_avg_energy(file_path):
-
-    samples, sampling_rate = librosa.load(file_path)
+def avg_energy_from_samples(samples):
 
-    for sample in range(len(samples)):
-        samples[sample] = samples[sample]*samples[sample]
+    # Vectorized in Feature_Time_Domain; the shared buffer is not modified
+    return avg_energy(samples)
 
-    return sum(samples)/len(samples)
+def extract_avg_energy(file_path):
 
+    return avg_energy_from_samples(load_audio(file_path).samples)
 
@@ -7,19 +7,15 @@
 # numerator = (amp1 * freq.1) + (amp2 *freq.2) + (ampN *freq.N)
 # denominator = amp1 + amp2 + amp3 + … ampN
 
-import librosa
-import numpy as np
-from numpy.fft import rfft
+from .Audio_Buffer import load_audio
+from .Feature_Spectral import FRAME_SIZE, HOP_LENGTH, spectral_features
 
-FRAME_SIZE = 1024
-HOP_LENGTH = 512
+def spectral_centroid_from_buffer(buffer):
 
-def extract_spectral_centroid(file_path):
+    # Shares the buffer's spectrogram with the other spectral features
+    return spectral_features(buffer, features=("centroid",))["centroid"]
 
-    samples, sampling_rate = librosa.load(file_path)
-    
-    spectral_centroid = librosa.feature.spectral_centroid(y=samples, sr = sampling_rate, n_fft=FRAME_SIZE, hop_length=HOP_LENGTH)[0]
-    
-    return sum(spectral_centroid)/len(spectral_centroid)
+def extract_spectral_centroid(file_path):
 
+    return spectral_centroid_from_buffer(load_audio(file_path))
 
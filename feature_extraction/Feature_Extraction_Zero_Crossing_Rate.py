@@ -4,11 +4,14 @@
 # Music is less variable
 # https://librosa.org/doc/main/generated/librosa.feature.zero_crossing_rate.html
 
-import librosa
+from .Audio_Buffer import load_audio
+from .Feature_Time_Domain import zero_crossing_rate
 
-def extract_zero_crossing(file_path):
+def zero_crossing_from_samples(samples):
+
+    # Same count as librosa.zero_crossings(samples, pad=False), without the Python sum
+    return zero_crossing_rate(samples)
 
-    samples, sampling_rate = librosa.load(file_path)
-    zero_crossings = librosa.zero_crossings(samples, pad=False)
+def extract_zero_crossing(file_path):
 
-    return sum(zero_crossings) / (2*(len(zero_crossings)-1))
\ No newline at end of file
+    return zero_crossing_from_samples(load_audio(file_path).samples)
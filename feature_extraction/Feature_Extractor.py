@@ -1,68 +1,242 @@
+import logging
 import os
-import pandas as pd
-
-from .Feature_Extraction_Zero_Crossing_Rate import extract_zero_crossing
-from .Feature_Extraction_Spectral_Centroid import extract_spectral_centroid
-from .Feature_Extraction_Avg_Energy import extract_avg_energy
-from .Feature_MFCCS import extract_mfcc
-
-def generate_file_list(dir_path):
-    print(f"Generating file list from directory: {dir_path}")
-    file_list = []
-
-    for root, dirs, files in os.walk(dir_path):
-        for file in files:
-            if file.endswith('.wav'):
-                full_path = os.path.join(root, file)
-                file_list.append(full_path)  # Append the full path
-    print(f"Found {len(file_list)} files.")
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from .Audio_Buffer import load_audio
+from .Audio_Catalog import AudioCatalog
+from .Audio_Fingerprint import find_duplicates
+from .Feature_Time_Domain import time_domain_features
+from .Feature_Spectral import spectral_features
+from .Feature_Streaming import stream_features
+from .Feature_Store import FeatureStore, DEFAULT_STORE_PATH
+from .Extraction_Metrics import Metrics, stage
+
+logger = logging.getLogger(__name__)
+
+FEATURES_CSV = 'feature_extraction/features.csv'
+
+# Files handed to a worker process at a time in parallel mode
+DEFAULT_CHUNK_SIZE = 4
+
+class ExtractionCancelled(Exception):
+    pass
+
+def generate_file_list(dir_path, catalog=None):
+    # One walk through the shared AudioCatalog; only headers of new or changed files are read
+    logger.info("Generating file list from directory: %s", dir_path)
+    catalog = catalog if catalog is not None else AudioCatalog()
+    file_list = [info.path for info in catalog.scan(dir_path)]  # Full paths
+    logger.info("Found %d files.", len(file_list))
     return file_list
 
-def pipeline(path, row):
-    print(f"Extracting features from {path}")
-    try:
-        avg_energy = extract_avg_energy(path)
-        row.append(avg_energy)
+def extract_features(path, metrics=None):
+    # Decode and resample once, then share the samples across extractors
+    return extract_features_from_buffer(load_audio(path, metrics=metrics))
 
-        spectral_centroid_avg = extract_spectral_centroid(path)
-        row.append(spectral_centroid_avg)
+def extract_features_from_buffer(buffer):
+    features = []
 
-        zero_crossing_feature = extract_zero_crossing(path)
-        row.append(zero_crossing_feature)
+    # Energy and zero crossings come out of one pass over the samples
+    samples = buffer.samples
+    with stage(buffer.metrics, "time_domain"):
+        time_features = time_domain_features(samples)
 
-        mfcc_features = extract_mfcc(path)
-        row.extend(mfcc_features)  # Use extend instead of append
+    avg_energy = time_features["avg_energy"]
+    features.append(avg_energy)
+
+    # The centroid and the MFCCs share one spectrogram at the target rate
+    spectral = spectral_features(buffer, features=("centroid", "mfcc"))
+
+    spectral_centroid_avg = spectral["centroid"]
+    features.append(spectral_centroid_avg)
+
+    zero_crossing_feature = time_features["zero_crossing"]
+    features.append(zero_crossing_feature)
+
+    mfcc_features = spectral["mfcc"]
+    features.extend(mfcc_features)  # Use extend instead of append
+    return features
+
+def pipeline(path, row, metrics=None):
+    logger.debug("Extracting features from %s", path)
+    try:
+        if metrics is None:
+            row.extend(extract_features(path))
+        else:
+            with metrics.file(path):
+                row.extend(extract_features(path, metrics=metrics))
     except Exception as e:
-        print(f"Error during feature extraction from {path}: {e}")
+        logger.error("Error during feature extraction from %s: %s", path, e)
 
 def determine_label(filename):
     return "yes" if "mu" in filename else "no"
 
-def generate_csv(dir_path):
-    print(f"Path received in generate_csv: {dir_path}")
-    data = []
-    files = generate_file_list(dir_path)
+def feature_header():
     headerList = ["fileName", "Avg_Energy", "Spectral_Centroid", "Zero_Crossing"]
     headerList.extend([f"MFCC_{i+1}" for i in range(13)])  # Add headers for each MFCC feature
     headerList.append("Label")
+    return headerList
 
+def make_row(path, features):
+    row = [os.path.basename(path)]  # Use only the filename
+    row.extend(features)
+    row.append(determine_label(path))  # Determine label after feature extraction
+    return row
+
+def extract_row(path, streaming=False, profile_dir=None, trace_memory=False):
+    # Runs in a worker process: return (features, error, metrics snapshot);
+    # features is None and error a message when the file fails.
+    # streaming=True reads the file in blocks with bounded memory (see Feature_Streaming)
+    metrics = Metrics(profile_dir=profile_dir, trace_memory=trace_memory)
+    try:
+        with metrics.file(path):
+            if streaming:
+                with metrics.stage("stream"):
+                    features = stream_features(path)
+            else:
+                features = extract_features(path, metrics=metrics)
+        return features, None, metrics.snapshot()
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}", metrics.snapshot()
+
+def generate_rows(files, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, cache=None, streaming=False, metrics=None,
+                  progress=None, cancel=None, fingerprints=None, duplicates="reuse", fingerprint_progress=None):
+    # Extract one row per file, keeping rows in the same order as files.
+    # workers=1 runs in this process, workers=None uses every CPU.
+    # Files that fail are reported and left out instead of aborting the batch.
+    # With a FeatureCache only new or changed files are extracted.
+    # Stage timings and counters are added to metrics (an Extraction_Metrics.Metrics).
+    # progress(done, total, path, ok) is called as each file finishes, cached
+    # files included. When cancel (a threading.Event) is set, files not yet
+    # started are dropped and ExtractionCancelled is raised.
+    # With a FingerprintIndex (Audio_Fingerprint) only the first copy of each
+    # clip in files is extracted; the other copies get its features
+    # (duplicates="reuse") or no row at all (duplicates="skip"). Fingerprinting
+    # reports to fingerprint_progress (same arguments as progress) and honours cancel.
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    duplicate_of = {}
+    if fingerprints is not None:
+        with stage(metrics, "fingerprint"):
+            canonical = find_duplicates(files, fingerprints, workers=workers, chunk_size=chunk_size,
+                                        progress=fingerprint_progress, cancel=cancel)
+        # Copies of a file from an earlier run are extracted normally
+        listed = set(files)
+        duplicate_of = {path: original for path, original in canonical.items() if original != path and original in listed}
+        logger.info("%d of %d files are near-duplicates of another file.", len(duplicate_of), len(files))
+        if metrics is not None:
+            metrics.increment("duplicates", len(duplicate_of))
+    unique = [path for path in files if path not in duplicate_of]
+
+    features = {}
+    if cache is not None:
+        for path in unique:
+            cached = cache.get(path, streaming)
+            if cached is not None:
+                features[path] = cached
+    pending = [path for path in unique if path not in features]
+    done = 0
+    if progress is not None:
+        for path in files:
+            if path in features or path in duplicate_of:
+                done += 1
+                progress(done, len(files), path, True)
+    if metrics is not None:
+        metrics.increment("files_total", len(files))
+        if cache is not None:
+            metrics.increment("cache_hits", len(unique) - len(pending))
+            metrics.increment("cache_misses", len(pending))
+    extract = partial(extract_row, streaming=streaming,
+                      profile_dir=metrics.profile_dir if metrics else None,
+                      trace_memory=metrics.trace_memory if metrics else False)
+
+    if workers <= 1 or len(pending) <= 1:
+        results = map(extract, pending)
+        failures = _collect(pending, results, features, cache, metrics, progress, cancel, done, len(files), streaming)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(extract, pending, chunksize=max(1, chunk_size))
+            try:
+                failures = _collect(pending, results, features, cache, metrics, progress, cancel, done, len(files), streaming)
+            except ExtractionCancelled:
+                # Only the chunks already running are waited for
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise
+
+    for path, error in failures:
+        logger.error("Error during feature extraction from %s: %s", path, error, extra={"path": path})
+    if failures:
+        logger.warning("%d of %d files failed and were skipped.", len(failures), len(files))
+    if cache is not None:
+        logger.info("Feature cache: %d reused, %d extracted.", len(unique) - len(pending), len(pending))
+
+    data = []
     for path in files:
-        row = [os.path.basename(path)]  # Use only the filename
+        source = duplicate_of.get(path, path)
+        if source in features and (source == path or duplicates == "reuse"):
+            data.append(make_row(path, features[source]))
+    return data, failures
 
-        pipeline(path, row)
+def _collect(files, results, features, cache, metrics, progress=None, cancel=None, done=0, total=0, streaming=False):
+    failures = []
+    for path, (extracted, error, snapshot) in zip(files, results):
+        if metrics is not None:
+            metrics.merge(snapshot, path=path)
+        if error is None:
+            logger.debug("Extracted features from %s", path)
+            features[path] = extracted
+            if cache is not None:
+                cache.put(path, extracted, streaming)
+        else:
+            failures.append((path, error))
+        if progress is not None:
+            done += 1
+            progress(done, total, path, error is None)
+        if cancel is not None and cancel.is_set():
+            logger.info("Extraction cancelled after %d of %d files.", done, total)
+            raise ExtractionCancelled()
+    return failures
 
-        label = determine_label(path)  # Determine label after feature extraction
-        row.append(label)
+def generate_csv(dir_path, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, output_path=FEATURES_CSV, cache=None, streaming=False, store_path=DEFAULT_STORE_PATH, metrics=None,
+                 progress=None, cancel=None, files=None, catalog=None, fingerprints=None, duplicates="reuse",
+                 fingerprint_progress=None):
+    # files: paths already listed by the caller (e.g. from an AudioCatalog scan); skips the walk
+    # fingerprints: a FingerprintIndex to extract each near-duplicate clip once (see generate_rows)
+    logger.info("Path received in generate_csv: %s", dir_path)
+    if files is None:
+        files = generate_file_list(dir_path, catalog)
 
-        data.append(row)
+    # A cancelled run raises before anything is written, so the previous CSV and store stay intact
+    data, failures = generate_rows(files, workers=workers, chunk_size=chunk_size, cache=cache, streaming=streaming, metrics=metrics,
+                                   progress=progress, cancel=cancel, fingerprints=fingerprints, duplicates=duplicates,
+                                   fingerprint_progress=fingerprint_progress)
+    return save_rows(data, output_path, store_path)
 
-    df = pd.DataFrame(data, columns=headerList)
-    print(f"DataFrame shape: {df.shape}")
+def save_rows(data, output_path=FEATURES_CSV, store_path=DEFAULT_STORE_PATH):
+    # Write generate_rows rows as features.csv and (unless store_path is None) the feature store
+    import pandas as pd
+    df = pd.DataFrame(data, columns=feature_header())
+    logger.info("DataFrame shape: %s", df.shape)
     if df.empty:
-        print("Warning: The DataFrame is empty. No data extracted.")
-    else:
-        print(df.head())  # Print the first few rows of the DataFrame
+        logger.warning("The DataFrame is empty. No data extracted.")
+    elif logger.isEnabledFor(logging.DEBUG):
+        logger.debug("First rows:\n%s", df.head())  # Only rendered when debugging
 
-    output_path = 'feature_extraction/features.csv'
-    df.to_csv(output_path, mode='w', index=False)
-    print(f"Features saved to CSV file at: {output_path}")
+    # The CSV goes to a temporary file and is renamed into place after the
+    # store is written, so a failure in either leaves both as they were
+    tmp_path = output_path + '.tmp'
+    df.to_csv(tmp_path, mode='w', index=False)
+    try:
+        # The binary store is what training and the GUI read back
+        if store_path is not None:
+            header = feature_header()
+            FeatureStore(store_path).write(header[1:-1], data)
+            logger.info("Features saved to feature store at: %s", store_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, output_path)
+    logger.info("Features saved to CSV file at: %s", output_path)
+    return df
@@ -1,7 +1,17 @@
 import librosa
 import numpy as np
 
-def extract_mfcc(file_path):
-    audio, sample_rate = librosa.load(file_path, sr=None)
-    mfccs = librosa.feature.mfcc(y=audio, sr=sample_rate, n_mfcc=13)
+from .Audio_Buffer import load_audio
+from .Feature_Spectral import N_MFCC, spectral_features
+
+# MFCCs of an arbitrary signal, computed with librosa's own STFT
+def mfcc_from_samples(audio, sample_rate):
+    mfccs = librosa.feature.mfcc(y=audio, sr=sample_rate, n_mfcc=N_MFCC)
     return np.mean(mfccs.T, axis=0)
+
+# MFCCs from the buffer's shared spectrogram at the target rate
+def mfcc_from_buffer(buffer):
+    return spectral_features(buffer, features=("mfcc",))["mfcc"]
+
+def extract_mfcc(file_path):
+    return mfcc_from_buffer(load_audio(file_path))
@@ -0,0 +1,93 @@
+# Segment Features
+# The extract_features vector for every overlapping window of a file,
+# computed from one pass of framewise features instead of one extraction per window
+
+# Window starts and lengths are whole multiples of HOP_LENGTH. That puts
+# every window on the file's frame grid. The file is decoded, resampled and
+# transformed once, and each window's features are then reduced from
+# per-block and per-frame arrays:
+#   Avg_Energy, Zero_Crossing  sums of squares and crossings per HOP_LENGTH
+#                              block (Feature_Time_Domain), summed over the
+#                              window's blocks with prefix sums
+#   Spectral_Centroid          mean of the per-frame centroids in the window
+#   MFCC_1..13                 DCT of the window's mean log-mel frame, with
+#                              the top_db floor taken from the window's own max
+# The columns match feature_header()[1:-1].
+#
+# Against extract_features on the cropped window samples, the time domain
+# values are exact. Spectral frames are exact except the two or so frames
+# at each window edge: the whole-file STFT sees the neighbouring audio
+# there, where a standalone extraction would see zero padding.
+# A file shorter than one window gives a single row equal to extract_features.
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .Extraction_Metrics import stage
+from .Feature_Extractor import extract_features_from_buffer
+from .Feature_Spectral import FRAME_SIZE, HOP_LENGTH, N_MELS, N_MFCC, TOP_DB, dct_basis, log_mel, spectral_frames
+from .Feature_Time_Domain import ZERO_THRESHOLD, _block_sums
+
+DEFAULT_WINDOW_S = 3.0
+DEFAULT_HOP_S = 1.0
+
+def _to_hops(seconds, sr):
+    return max(1, int(round(seconds * sr / HOP_LENGTH)))
+
+def window_starts(n_samples, window_length, hop_length):
+    # Window starts in samples. A last window flush with the end (on the
+    # frame grid) is added so the tail of the file is covered.
+    starts = np.arange(0, n_samples - window_length + 1, hop_length)
+    last = (n_samples - window_length) // HOP_LENGTH * HOP_LENGTH
+    if last > starts[-1]:
+        starts = np.append(starts, last)
+    return starts
+
+def segment_features(buffer, window_s=DEFAULT_WINDOW_S, hop_s=DEFAULT_HOP_S):
+    # Returns (starts_s, ends_s, features) with features of shape (n_windows, 3 + N_MFCC)
+    if hop_s > window_s:
+        raise ValueError(f"hop ({hop_s} s) must not exceed the window ({window_s} s)")
+    samples = buffer.samples
+    sr = buffer.sampling_rate
+    n = len(samples)
+    window_hops = _to_hops(window_s, sr)
+    window_length = window_hops * HOP_LENGTH
+
+    if n <= window_length:
+        return np.array([0.0]), np.array([n / sr]), np.array([extract_features_from_buffer(buffer)])
+
+    starts = window_starts(n, window_length, _to_hops(hop_s, sr) * HOP_LENGTH)
+    first_block = starts // HOP_LENGTH
+    last_block = first_block + window_hops
+
+    with stage(buffer.metrics, "time_domain"):
+        energy, crossings = _block_sums(samples, HOP_LENGTH)
+        # _block_sums counts the crossing into each block's first sample; a
+        # window must not count the one from the sample before it
+        negative = samples[first_block * HOP_LENGTH] < -ZERO_THRESHOLD
+        previous_negative = samples[np.maximum(first_block * HOP_LENGTH - 1, 0)] < -ZERO_THRESHOLD
+        leading = (negative != previous_negative) & (first_block > 0)
+
+        energy_sums = np.concatenate(([0.0], np.cumsum(energy)))
+        crossing_sums = np.concatenate(([0], np.cumsum(crossings)))
+        avg_energy = (energy_sums[last_block] - energy_sums[first_block]) / window_length
+        zero_crossing = (crossing_sums[last_block] - crossing_sums[first_block] - leading) / (2 * (window_length - 1))
+
+    # A centred window of window_hops hops spans window_hops + 1 frames
+    window_frames = window_hops + 1
+    centroid = spectral_frames(buffer, features=("centroid",))["centroid"]
+    centroid_sums = np.concatenate(([0.0], np.cumsum(centroid, dtype=np.float64)))
+    mean_centroid = (centroid_sums[first_block + window_frames] - centroid_sums[first_block]) / window_frames
+
+    with stage(buffer.metrics, "mfcc"):
+        mel_db = log_mel(buffer.magnitude(FRAME_SIZE, HOP_LENGTH) ** 2, sr, FRAME_SIZE, top_db=None)
+        floors = sliding_window_view(mel_db.max(axis=0), window_frames).max(axis=1)[first_block] - TOP_DB
+        mean_log_mel = np.empty((len(starts), N_MELS))
+        clipped = np.empty((N_MELS, window_frames), dtype=mel_db.dtype)
+        for i, (start, floor) in enumerate(zip(first_block, floors)):
+            np.maximum(mel_db[:, start:start + window_frames], floor, out=clipped)
+            mean_log_mel[i] = clipped.mean(axis=1)
+        mfccs = mean_log_mel @ dct_basis(N_MELS, N_MFCC).T
+
+    features = np.column_stack((avg_energy, mean_centroid, zero_crossing, mfccs))
+    return starts / sr, (starts + window_length) / sr, features
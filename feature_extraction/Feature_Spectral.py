@@ -0,0 +1,108 @@
+# Spectral Features
+# One spectrogram per file, shared by every frequency-domain feature
+
+# Before this module the spectral centroid and the MFCCs each ran their own
+# STFT, at two sample rates with two FFT sizes. Now every descriptor is
+# derived from the single |STFT| the AudioBuffer computes at TARGET_SR with
+# FRAME_SIZE/HOP_LENGTH:
+#   centroid   magnitude-weighted mean frequency
+#   rolloff    frequency below which ROLL_PERCENT of the magnitude lies
+#   bandwidth  magnitude-weighted standard deviation around the centroid
+#   flux       L2 distance between consecutive magnitude frames
+#   mfcc       DCT-II of the log-mel power spectrum
+# These follow the librosa.feature definitions; librosa's own functions
+# would each recompute the STFT. The mel filterbank, DCT matrix and bin
+# frequencies are cached per (sr, n_fft, n_mels).
+
+from functools import lru_cache
+
+import librosa
+import numpy as np
+
+from .Extraction_Metrics import stage
+
+# One STFT per file is shared by every spectral feature, so the frame size
+# matches librosa's MFCC default. Re-exported by the spectral centroid module.
+FRAME_SIZE = 2048
+HOP_LENGTH = 512
+
+N_MELS = 128
+N_MFCC = 13  # Re-exported by Feature_MFCCS
+ROLL_PERCENT = 0.85
+TOP_DB = 80.0
+AMIN = 1e-10
+
+SPECTRAL_FEATURES = ("centroid", "rolloff", "bandwidth", "flux", "mfcc")
+
+@lru_cache(maxsize=None)
+def mel_basis(sr, n_fft, n_mels=N_MELS):
+    basis = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels)
+    basis.setflags(write=False)
+    return basis
+
+@lru_cache(maxsize=None)
+def dct_basis(n_mels=N_MELS, n_mfcc=N_MFCC):
+    # Rows of the orthonormal DCT-II, so dct_basis @ log_mel equals scipy.fft.dct(log_mel, norm='ortho')[:n_mfcc]
+    import scipy.fft
+    basis = scipy.fft.dct(np.eye(n_mels), type=2, norm='ortho', axis=0)[:n_mfcc]
+    basis.setflags(write=False)
+    return basis
+
+@lru_cache(maxsize=None)
+def bin_frequencies(sr, n_fft):
+    frequencies = librosa.fft_frequencies(sr=sr, n_fft=n_fft)
+    frequencies.setflags(write=False)
+    return frequencies
+
+def log_mel(power, sr, n_fft, n_mels=N_MELS, top_db=TOP_DB):
+    # power_to_db(mel power, ref=1.0, amin=AMIN, top_db=top_db)
+    mel_db = 10.0 * np.log10(np.maximum(AMIN, mel_basis(sr, n_fft, n_mels) @ power))
+    if top_db is not None:
+        np.maximum(mel_db, mel_db.max() - top_db, out=mel_db)
+    return mel_db
+
+def spectral_frames(buffer, features=SPECTRAL_FEATURES, n_fft=FRAME_SIZE, hop_length=HOP_LENGTH, n_mfcc=N_MFCC):
+    # Per-frame values of each requested feature from one shared |STFT|.
+    # Scalar features are arrays of shape (n_frames,); "mfcc" is (n_mfcc, n_frames).
+    sr = buffer.sampling_rate
+    magnitude = buffer.magnitude(n_fft, hop_length)
+    frequencies = bin_frequencies(sr, n_fft)
+    frames = {}
+    metrics = buffer.metrics
+
+    with stage(metrics, "spectral"):
+        _descriptor_frames(magnitude, frequencies, features, frames)
+
+    if "mfcc" in features:
+        with stage(metrics, "mfcc"):
+            frames["mfcc"] = dct_basis(N_MELS, n_mfcc) @ log_mel(magnitude ** 2, sr, n_fft)
+
+    return frames
+
+def _descriptor_frames(magnitude, frequencies, features, frames):
+    if {"centroid", "bandwidth"} & set(features):
+        # Column-normalise like librosa; silent frames stay unnormalised
+        norm = magnitude.sum(axis=0)
+        norm[norm < np.finfo(magnitude.dtype).tiny] = 1.0
+        centroid = (frequencies @ magnitude) / norm
+        if "centroid" in features:
+            frames["centroid"] = centroid
+        if "bandwidth" in features:
+            deviation = (frequencies[:, np.newaxis] - centroid) ** 2
+            frames["bandwidth"] = np.sqrt(np.einsum('ft,ft->t', magnitude, deviation) / norm)
+
+    if "rolloff" in features:
+        cumulative = np.cumsum(magnitude, axis=0)
+        threshold = ROLL_PERCENT * cumulative[-1]
+        frames["rolloff"] = frequencies[np.argmax(cumulative >= threshold, axis=0)]
+
+    if "flux" in features:
+        flux = np.zeros(magnitude.shape[1])
+        if magnitude.shape[1] > 1:
+            flux[1:] = np.sqrt(np.sum(np.diff(magnitude, axis=1) ** 2, axis=0))
+        frames["flux"] = flux
+
+def spectral_features(buffer, features=SPECTRAL_FEATURES, n_fft=FRAME_SIZE, hop_length=HOP_LENGTH, n_mfcc=N_MFCC):
+    # File-level means of spectral_frames; "mfcc" is a vector of n_mfcc means
+    frames = spectral_frames(buffer, features, n_fft=n_fft, hop_length=hop_length, n_mfcc=n_mfcc)
+    return {name: values.mean(axis=-1) for name, values in frames.items()}
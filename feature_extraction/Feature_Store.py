@@ -0,0 +1,184 @@
+# Feature Store
+# Binary, memory-mapped replacement for re-reading features.csv
+
+# The store is a directory holding two files:
+#   meta.json    the feature column names and the width of the fileName field
+#   records.bin  fixed-size records (fileName, features, label) back to back
+# Loading maps records.bin with numpy.memmap. Nothing is parsed, and the
+# feature matrix is a view of the file. Appending writes new records to
+# the end. A dict from fileName to record number gives O(1) lookups.
+#
+# File names are basenames, so files from different folders can share one.
+# arrays() and to_frame() keep every record, like features.csv. lookup()
+# and label() return the newest record for a shared name and log a warning.
+#
+# write() builds both files under temporary names and renames them into
+# place, meta.json last. A crash leaves either the old store or no store
+# (exists() is False and readers fall back to features.csv), never a
+# partial one, and memory maps of the old records.bin stay valid.
+
+import json
+import logging
+import os
+
+import numpy as np
+
+DEFAULT_STORE_PATH = 'feature_extraction/feature_store'
+NAME_WIDTH = 128  # minimum; write() widens the field for longer names
+
+logger = logging.getLogger(__name__)
+
+def _record_dtype(n_features, name_width):
+    return np.dtype([
+        ('fileName', f'S{name_width}'),
+        ('features', '<f8', (n_features,)),
+        ('label', 'i1'),  # 1 for music ("yes"), 0 for speech ("no")
+    ])
+
+class FeatureStore:
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self.meta_path = os.path.join(path, 'meta.json')
+        self.records_path = os.path.join(path, 'records.bin')
+        self.columns = None
+        self.dtype = None
+        self._records = None
+        self._index = None
+        self._shared = None  # names stored more than once
+        if self.exists():
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            self.columns = meta["columns"]
+            self.dtype = _record_dtype(len(self.columns), meta["name_width"])
+
+    def exists(self):
+        return os.path.exists(self.meta_path) and os.path.exists(self.records_path)
+
+    def create(self, columns, name_width=NAME_WIDTH):
+        # Start an empty store, replacing anything already at self.path
+        os.makedirs(self.path, exist_ok=True)
+        with open(self.meta_path, 'w') as f:
+            json.dump({"columns": list(columns), "name_width": name_width}, f)
+        open(self.records_path, 'wb').close()
+        self.columns = list(columns)
+        self.dtype = _record_dtype(len(self.columns), name_width)
+        self._records = None
+        self._index = None
+        self._shared = None
+
+    def _to_records(self, rows, dtype=None):
+        # rows are generate_csv rows: [fileName, feature1 ... featureN, Label]
+        dtype = dtype or self.dtype
+        records = np.zeros(len(rows), dtype=dtype)
+        width = dtype['fileName'].itemsize
+        for i, row in enumerate(rows):
+            name = row[0].encode('utf-8')
+            if len(name) > width:
+                raise ValueError(f"File name longer than {width} bytes: {row[0]}")
+            records[i] = (name, row[1:-1], 1 if row[-1] == "yes" else 0)
+        return records
+
+    def write(self, columns, rows, name_width=None):
+        # Replace the store with rows, atomically
+        if name_width is None:
+            name_width = max([NAME_WIDTH] + [len(row[0].encode('utf-8')) for row in rows])
+        dtype = _record_dtype(len(columns), name_width)
+        records = self._to_records(rows, dtype)
+        os.makedirs(self.path, exist_ok=True)
+        records_tmp = self.records_path + '.tmp'
+        meta_tmp = self.meta_path + '.tmp'
+        with open(records_tmp, 'wb') as f:
+            f.write(records.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(meta_tmp, 'w') as f:
+            json.dump({"columns": list(columns), "name_width": name_width}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        # Without meta.json the store does not exist, so old metadata never describes new records
+        if os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
+        os.replace(records_tmp, self.records_path)
+        os.replace(meta_tmp, self.meta_path)
+        self.columns = list(columns)
+        self.dtype = dtype
+        self._records = None
+        self._index = None
+        self._shared = None
+
+    def append(self, rows):
+        if self.dtype is None:
+            raise ValueError(f"No feature store at {self.path}; call create() or write() first")
+        records = self._to_records(rows)
+        start = len(self)
+        with open(self.records_path, 'ab') as f:
+            f.write(records.tobytes())
+        self._records = None
+        if self._index is not None:
+            for offset, name in enumerate(records['fileName']):
+                name = name.decode('utf-8')
+                if name in self._index:
+                    self._shared.add(name)
+                self._index[name] = start + offset
+
+    def records(self):
+        # All records, newest last, as a read-only memory map
+        if self._records is None:
+            if self.dtype is None:
+                raise ValueError(f"No feature store at {self.path}")
+            if os.path.getsize(self.records_path) == 0:
+                self._records = np.zeros(0, dtype=self.dtype)
+            else:
+                self._records = np.memmap(self.records_path, dtype=self.dtype, mode='r')
+        return self._records
+
+    def __len__(self):
+        if self.dtype is None:
+            return 0
+        return os.path.getsize(self.records_path) // self.dtype.itemsize
+
+    def index(self):
+        # fileName -> position of its newest record
+        if self._index is None:
+            names = np.char.decode(self.records()['fileName'], 'utf-8')
+            self._index = {name: i for i, name in enumerate(names)}
+            self._shared = set()
+            if len(self._index) != len(names):
+                unique, counts = np.unique(names, return_counts=True)
+                self._shared = set(unique[counts > 1].tolist())
+        return self._index
+
+    def _position(self, file_name):
+        position = self.index().get(file_name)
+        if position is not None and file_name in self._shared:
+            logger.warning("%s names more than one record in %s; using the newest", file_name, self.path)
+        return position
+
+    def lookup(self, file_name):
+        # Feature vector for file_name, or None if it has not been stored
+        position = self._position(file_name)
+        if position is None:
+            return None
+        return self.records()['features'][position]
+
+    def label(self, file_name):
+        position = self._position(file_name)
+        if position is None:
+            return None
+        return "yes" if self.records()['label'][position] else "no"
+
+    def arrays(self):
+        # (file names, feature matrix, labels) for every record, in order; the
+        # matrix is a view of the memory map
+        records = self.records()
+        names = np.char.decode(records['fileName'], 'utf-8')
+        return names, records['features'], records['label']
+
+    def to_frame(self):
+        # Same layout as features.csv
+        import pandas as pd
+        names, features, labels = self.arrays()
+        frame = pd.DataFrame(features, columns=self.columns, copy=False)
+        frame.insert(0, "fileName", names)
+        frame["Label"] = np.where(labels == 1, "yes", "no")
+        return frame
@@ -0,0 +1,114 @@
+# Time Domain Features
+# Average energy, zero-crossing rate and RMS in a single vectorized pass
+
+# The signal is walked once in chunks of whole hops. For every hop-sized block
+# we keep two numbers, the sum of squares and the number of zero crossings,
+# and every frame statistic is built from those block sums. frame_length must
+# therefore be a multiple of hop_length. Float32 input is accumulated in
+# float64 without converting the whole array, and the only temporaries are
+# boolean masks the size of one chunk.
+
+# Frames are not centred (no padding), like librosa.util.frame.
+# Per-frame ZCR is crossings / frame_length, as in librosa.feature.zero_crossing_rate.
+# The whole-file values match the original extractors:
+#   avg_energy   = sum(x^2) / N
+#   zero_crossing = crossings / (2 * (N - 1))
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .Feature_Extraction_Spectral_Centroid import FRAME_SIZE, HOP_LENGTH
+
+# Samples with |x| <= threshold count as positive, as in librosa.zero_crossings
+ZERO_THRESHOLD = 1e-10
+
+# Hops processed per chunk; bounds the size of the temporary masks
+CHUNK_HOPS = 4096
+
+def _block_sums(samples, hop_length, threshold=ZERO_THRESHOLD):
+    # Sum of squares and zero-crossing count for every hop-sized block.
+    # A trailing partial block is included as the last entry.
+    n = len(samples)
+    n_blocks = -(-n // hop_length)
+    energy = np.empty(n_blocks, dtype=np.float64)
+    crossings = np.empty(n_blocks, dtype=np.int64)
+
+    chunk_length = CHUNK_HOPS * hop_length
+    crossed = np.empty(min(n, chunk_length), dtype=bool)
+    previous_negative = None
+    block = 0
+    for start in range(0, n, chunk_length):
+        chunk = samples[start:start + chunk_length]
+        m = len(chunk)
+        negative = chunk < -threshold
+
+        # crossed[j] marks a sign change between sample j-1 and sample j
+        crossed[0] = previous_negative is not None and negative[0] != previous_negative
+        np.not_equal(negative[1:], negative[:-1], out=crossed[1:m])
+        previous_negative = negative[-1]
+
+        full = m // hop_length
+        if full:
+            blocks = chunk[:full * hop_length].reshape(full, hop_length)
+            energy[block:block + full] = np.einsum('ij,ij->i', blocks, blocks, dtype=np.float64)
+            crossings[block:block + full] = np.count_nonzero(crossed[:full * hop_length].reshape(full, hop_length), axis=1)
+            block += full
+        if m % hop_length:
+            tail = chunk[full * hop_length:]
+            energy[block] = np.einsum('i,i->', tail, tail, dtype=np.float64)
+            crossings[block] = np.count_nonzero(crossed[full * hop_length:m])
+            block += 1
+
+    return energy, crossings
+
+def _stats(prefix, values):
+    if len(values) == 0:
+        nan = float('nan')
+        return {f"{prefix}_mean": nan, f"{prefix}_std": nan, f"{prefix}_min": nan, f"{prefix}_max": nan}
+    return {
+        f"{prefix}_mean": float(values.mean()),
+        f"{prefix}_std": float(values.std()),
+        f"{prefix}_min": float(values.min()),
+        f"{prefix}_max": float(values.max()),
+    }
+
+def time_domain_features(samples, frame_length=FRAME_SIZE, hop_length=HOP_LENGTH):
+    if frame_length % hop_length:
+        raise ValueError(f"frame_length ({frame_length}) must be a multiple of hop_length ({hop_length})")
+    samples = np.asarray(samples)
+    n = len(samples)
+    if n < 2:
+        raise ValueError("at least two samples are needed for time domain features")
+
+    energy, crossings = _block_sums(samples, hop_length)
+
+    # Frames are runs of blocks_per_frame complete blocks
+    blocks_per_frame = frame_length // hop_length
+    complete = n // hop_length
+    if complete >= blocks_per_frame:
+        frame_energy = sliding_window_view(energy[:complete], blocks_per_frame).sum(axis=1) / frame_length
+        frame_zcr = sliding_window_view(crossings[:complete], blocks_per_frame).sum(axis=1) / frame_length
+    else:
+        frame_energy = np.empty(0)
+        frame_zcr = np.empty(0)
+    frame_rms = np.sqrt(frame_energy)
+
+    total_energy = energy.sum() / n
+    features = {
+        "avg_energy": float(total_energy),
+        "zero_crossing": float(crossings.sum() / (2 * (n - 1))),
+        "rms": float(np.sqrt(total_energy)),
+        "n_frames": len(frame_energy),
+    }
+    features.update(_stats("energy", frame_energy))
+    features.update(_stats("rms", frame_rms))
+    features.update(_stats("zcr", frame_zcr))
+    return features
+
+def avg_energy(samples):
+    samples = np.asarray(samples)
+    return float(np.einsum('i,i->', samples, samples, dtype=np.float64) / len(samples))
+
+def zero_crossing_rate(samples):
+    _, crossings = _block_sums(np.asarray(samples), HOP_LENGTH)
+    return float(crossings.sum() / (2 * (len(samples) - 1)))
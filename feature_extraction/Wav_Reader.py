@@ -0,0 +1,148 @@
+# WAV Reader
+# Memory-maps the data chunk of uncompressed WAV files instead of decoding them
+
+# librosa.load reads the whole file through soundfile into a new float
+# array. For PCM and IEEE-float WAVs, the samples already sit in the file
+# in a layout NumPy can address. open_wav parses the RIFF header and
+# exposes the data chunk as a read-only np.memmap of shape (frames,
+# channels):
+#   - nothing is read until samples are touched, and the OS page cache is
+#     shared between processes reading the same file
+#   - channel(i) is a strided view, so no copy is made
+#   - to_float32 converts a range to mono float32 only when asked, with the
+#     same scaling and channel mean as librosa.load, so the result is bit
+#     for bit the array librosa.load(path, sr=None) returns
+#   - blocks and iter_frames walk the file with one reused output buffer
+# Other files (compressed, 24-bit, non-WAV) make open_wav return None, and
+# callers fall back to librosa.load.
+
+import os
+import struct
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# (format, bits per sample) -> (stored dtype, offset, scale); float = (x - offset) / scale
+SAMPLE_FORMATS = {
+    (WAVE_FORMAT_PCM, 8): (np.dtype('u1'), 128.0, 128.0),
+    (WAVE_FORMAT_PCM, 16): (np.dtype('<i2'), 0.0, 32768.0),
+    (WAVE_FORMAT_PCM, 32): (np.dtype('<i4'), 0.0, 2147483648.0),
+    (WAVE_FORMAT_IEEE_FLOAT, 32): (np.dtype('<f4'), 0.0, 1.0),
+    (WAVE_FORMAT_IEEE_FLOAT, 64): (np.dtype('<f8'), 0.0, 1.0),
+}
+
+DEFAULT_BLOCK_SIZE = 65536
+
+class UnsupportedWav(ValueError):
+    pass
+
+def read_header(path):
+    # Returns (format, channels, rate, bits, data_offset, data_bytes)
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12:
+            raise UnsupportedWav(f"{path} is too short to be a WAV file")
+        riff, _, wave = struct.unpack('<4sI4s', header)
+        if riff != b'RIFF' or wave != b'WAVE':
+            raise UnsupportedWav(f"{path} is not a RIFF/WAVE file")
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise UnsupportedWav(f"{path} has no data chunk")
+            chunk_id, size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                body = f.read(size)
+                if len(body) < 16:
+                    raise UnsupportedWav(f"{path} has a truncated fmt chunk")
+                format_tag, channels, rate, _, _, bits = struct.unpack('<HHIIHH', body[:16])
+                if format_tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                    format_tag = struct.unpack('<H', body[24:26])[0]  # first two bytes of the sub-format GUID
+                fmt = (format_tag, channels, rate, bits)
+                if size % 2:
+                    f.seek(1, os.SEEK_CUR)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise UnsupportedWav(f"{path} has data before its fmt chunk")
+                offset = f.tell()
+                # Streamed writers leave the size at 0 or 0xFFFFFFFF; trust the file length then
+                available = file_size - offset
+                data_bytes = size if 0 < size <= available else available
+                return fmt + (offset, data_bytes)
+            else:
+                f.seek(size + size % 2, os.SEEK_CUR)
+
+class WavFile:
+    def __init__(self, path):
+        format_tag, channels, rate, bits, offset, data_bytes = read_header(path)
+        if (format_tag, bits) not in SAMPLE_FORMATS:
+            raise UnsupportedWav(f"{path}: {bits}-bit format {format_tag:#06x} cannot be memory-mapped")
+        self.path = path
+        self.rate = rate
+        self.channels = channels
+        self.dtype, self._offset, self._scale = SAMPLE_FORMATS[(format_tag, bits)]
+        self.frames = data_bytes // (self.dtype.itemsize * channels)
+        if self.frames:
+            self.data = np.memmap(path, dtype=self.dtype, mode='r', offset=offset, shape=(self.frames, channels))
+        else:
+            self.data = np.empty((0, channels), dtype=self.dtype)
+
+    @property
+    def duration(self):
+        return self.frames / self.rate
+
+    def channel(self, index):
+        # Raw samples of one channel as a view into the mapped file
+        return self.data[:, index]
+
+    def to_float32(self, start=0, stop=None, out=None):
+        # Mono float32 of frames [start, stop), scaled and mixed like librosa.load
+        raw = self.data[start:stop]
+        n = len(raw)
+        if out is None:
+            out = np.empty(n, dtype=np.float32)
+        out = out[:n]
+        if self.channels == 1:
+            np.subtract(raw[:, 0], self._offset, out=out, casting='unsafe')
+            if self._scale != 1.0:
+                out /= np.float32(self._scale)
+        else:
+            converted = raw.astype(np.float32)
+            if self._offset:
+                converted -= np.float32(self._offset)
+            if self._scale != 1.0:
+                converted /= np.float32(self._scale)
+            np.mean(converted, axis=1, out=out)
+        return out
+
+    def blocks(self, block_size=DEFAULT_BLOCK_SIZE):
+        # Consecutive mono float32 blocks; the same buffer is reused for each
+        out = np.empty(block_size, dtype=np.float32)
+        for start in range(0, self.frames, block_size):
+            yield self.to_float32(start, start + block_size, out=out)
+
+    def iter_frames(self, frame_length, hop_length, block_frames=256):
+        # Overlapping mono float32 frames (not centred, like librosa.util.frame),
+        # converted block_frames frames at a time. Frames are views into a
+        # reused buffer: copy any frame that must outlive the next block.
+        span = (block_frames - 1) * hop_length + frame_length
+        out = np.empty(span, dtype=np.float32)
+        for start in range(0, max(self.frames - frame_length, -1) + 1, block_frames * hop_length):
+            chunk = self.to_float32(start, start + span, out=out)
+            if len(chunk) < frame_length:
+                return
+            yield from sliding_window_view(chunk, frame_length)[::hop_length]
+
+def open_wav(path):
+    # A WavFile when the file can be memory-mapped, otherwise None
+    if not path.lower().endswith(('.wav', '.wave')):
+        return None
+    try:
+        return WavFile(path)
+    except (UnsupportedWav, struct.error, OSError):
+        return None
@@ -1,9 +1,9 @@
-import os
 import tkinter as tk
 from tkinter import filedialog, ttk
 import pygame
 import threading
 import time
+from feature_extraction.Audio_Catalog import AudioCatalog
 
 class AudioClassifierGUI:
     def __init__(self, root):
@@ -47,7 +47,9 @@ class AudioClassifierGUI:
         self.progress_label.pack()
 
         pygame.mixer.init()
+        self.catalog = AudioCatalog()
         self.file_paths = {}
+        self.durations = {}  # file name -> seconds, from the WAV header
         self.current_audio = None
         self.is_playing = False
         self.is_paused = False
@@ -60,12 +62,12 @@ class AudioClassifierGUI:
     def populate_list(self, folder_path):
         self.listbox.delete(0, tk.END)
         self.file_paths.clear()
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                if file.lower().endswith('.wav'):
-                    full_path = os.path.join(root, file)
-                    self.listbox.insert(tk.END, file)
-                    self.file_paths[file] = full_path
+        self.durations.clear()
+        # One walk, headers only; durations come from the catalog instead of decoding
+        for info in self.catalog.scan(folder_path):
+            self.listbox.insert(tk.END, info.name)
+            self.file_paths[info.name] = info.path
+            self.durations[info.name] = info.duration
 
     def play_audio(self):
         selected_file = self.listbox.get(tk.ACTIVE)
@@ -99,13 +101,17 @@ class AudioClassifierGUI:
     def update_progress_label(self):
         while pygame.mixer.music.get_busy():
             elapsed_time = pygame.mixer.music.get_pos() // 1000
-            total_time = pygame.mixer.Sound(self.file_paths[self.listbox.get(tk.ACTIVE)]).get_length()
+            total_time = self.durations.get(self.listbox.get(tk.ACTIVE)) or 0
             elapsed_min, elapsed_sec = divmod(elapsed_time, 60)
             total_min, total_sec = divmod(int(total_time), 60)
             time_str = f"{elapsed_min:02}:{elapsed_sec:02} / {total_min:02}:{total_sec:02}"
             self.progress_label.config(text=time_str)
             time.sleep(1)
 
-root = tk.Tk()
-gui = AudioClassifierGUI(root)
-root.mainloop()
+def main():
+    root = tk.Tk()
+    gui = AudioClassifierGUI(root)
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()